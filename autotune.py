@@ -0,0 +1,136 @@
+'''
+Automatic engine selection for Scenario(engine="auto").
+
+Every engine that can run a scenario (see engine_candidates) gets a linear
+cost model, seconds = overhead + per_walk * attempts, fitted from two short
+timed runs on the scenario's task and street. The fits are cached on disk
+per machine, task and street, so calibration only runs the first time a
+combination is seen. The engine with the lowest estimated cost is picked and
+the decision is logged on the "wayhome" logger.
+
+Only engines that give exact results are candidates unless the caller passes
+approximate=True: the jump engine rounds the starting heading of each
+excursion to a bin (see jump.py), so it may trade accuracy for speed.
+
+The cache lives in $WAYHOME_CACHE or ~/.cache/wayhome/engines.json.
+'''
+import json
+import logging
+import os
+import platform
+import tempfile
+import time
+
+logger = logging.getLogger("wayhome")
+
+CALIBRATION_SIZES = (64, 256) # walks per timed run; the model is fitted through both
+CACHE = {} # in-memory copy of the cache file
+
+
+def cache_path():
+    return os.environ.get("WAYHOME_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "wayhome", "engines.json")
+
+
+def machine_key():
+    return f"{platform.node()}|{platform.machine()}|{os.cpu_count()}|{platform.python_version()}"
+
+
+def street_key(task, street):
+    zones = ",".join(f"{zone.zone_type[0]}{zone.length:g}" for zone in street.zones)
+    return f"{task}|{zones}|{street.probability_of_hit_on_danger_zone:g}"
+
+
+def engine_candidates(task, record="all", sampling="pseudo", replayable=False, approximate=False):
+    '''
+    Engines that can run a scenario with these settings, the reference first;
+    the approximate jump engine only when approximate is set
+    '''
+    candidates = ["reference"]
+    if task == "A" and record == "none" and not replayable:
+        candidates.append("fast_a")
+    if task in ("B", "C") and approximate:
+        candidates.append("jump")
+    if record == "none" and sampling == "pseudo" and not replayable:
+        candidates.append("vectorized")
+    return candidates
+
+
+def load_cache():
+    if not CACHE:
+        try:
+            with open(cache_path()) as f:
+                CACHE.update(json.load(f))
+        except (OSError, ValueError):
+            pass # no cache yet, or a broken one that gets rewritten
+    return CACHE
+
+
+def save_cache():
+    path = cache_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # a temporary file of its own, so processes saving at the same time never mix their writes
+        with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(path), suffix=".tmp", delete=False) as f:
+            json.dump(CACHE, f, indent=1)
+        os.replace(f.name, path)
+    except OSError as error:
+        logger.warning("could not write the engine calibration cache %s: %s", path, error)
+
+
+def time_engine(task, engine, attempts, street):
+    '''
+    Seconds one run of attempts walks takes; the best of two tries
+    '''
+    from simulation import Scenario
+
+    best = float("inf")
+    for attempt in range(2):
+        scenario = Scenario(attempts, task, seed=attempt, engine=engine, record="none", street=street)
+        start = time.perf_counter()
+        scenario.run_codes()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def calibrate(task, engine, street):
+    '''
+    Fits (overhead, per_walk) seconds for an engine on a task and street
+    '''
+    small, large = CALIBRATION_SIZES
+    t_small, t_large = time_engine(task, engine, small, street), time_engine(task, engine, large, street)
+    per_walk = max(t_large - t_small, 0.) / (large - small) or t_large / large
+    overhead = max(t_small - per_walk * small, 0.)
+    return [overhead, per_walk]
+
+
+def cost_models(task, street, candidates):
+    '''
+    The (overhead, per_walk) model of every candidate engine, calibrating
+    and caching whatever is missing
+    '''
+    entries = load_cache().setdefault(machine_key(), {}).setdefault(street_key(task, street), {})
+    missing = [engine for engine in candidates if engine not in entries]
+    for engine in missing:
+        entries[engine] = calibrate(task, engine, street)
+    if missing:
+        logger.info("calibrated engines %s for task %s on this machine", ", ".join(missing), task)
+        save_cache()
+    return {engine: entries[engine] for engine in candidates}
+
+
+def choose_engine(task, attempts, street, record="all", sampling="pseudo", replayable=False, approximate=False):
+    '''
+    The engine with the lowest estimated cost, and the estimated seconds of
+    every candidate
+    '''
+    candidates = engine_candidates(task, record, sampling, replayable, approximate)
+    if len(candidates) == 1:
+        estimates = {candidates[0]: None}
+    else:
+        estimates = {engine: overhead + per_walk * attempts
+                     for engine, (overhead, per_walk) in cost_models(task, street, candidates).items()}
+    engine = min(candidates, key=lambda name: estimates[name] or 0.)
+    logger.info("engine auto: %s for %d task %s walks (estimated %s)%s", engine, attempts, task,
+                ", ".join(f"{name} {seconds:.3g} s" if seconds is not None else name for name, seconds in estimates.items()),
+                ", approximate results" if engine == "jump" else "")
+    return engine, estimates
@@ -0,0 +1,120 @@
+'''
+Headless batch rendering of figures to files.
+
+A render job is a dict naming the kind of figure, the file to write (the
+extension picks PNG, SVG, PDF, ...) and its data:
+
+    {"kind": "walks", "path": "b_walks.png", "walks": [...]}   # or "source": a CLI npz with recorded walks
+    {"kind": "survival", "path": "bars.svg", "labels": [...], "survival": [...], "success": [...]}
+    {"kind": "heatmap", "path": "sweep.png", "values": [[...]], "rows": [...], "columns": [...]}
+
+Jobs are rendered on a process pool with the Agg backend. Figures are made
+without pyplot, so no window is ever opened and nothing is kept open between
+jobs.
+'''
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+RENDER_KINDS = ("walks", "survival", "heatmap")
+
+
+def use_agg():
+    '''
+    Process pool initializer: picks the non-interactive backend
+    '''
+    import matplotlib
+    matplotlib.use("Agg", force=True)
+
+
+def load_walks(path):
+    '''
+    The recorded walks of an npz written by the CLI, as views into one array
+    '''
+    with np.load(path) as data:
+        if "walk_positions" not in data.files:
+            return []
+        positions, lengths = data["walk_positions"], data["walk_lengths"]
+    return np.split(positions, np.cumsum(lengths)[:-1])
+
+
+def render(job):
+    '''
+    Draws one job into its file and returns (path, seconds)
+    '''
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    from simulation import Street
+    from visualization import draw_heatmap, draw_survival_bars, draw_walks
+
+    start = time.perf_counter()
+    kind = job["kind"]
+    if kind not in RENDER_KINDS:
+        raise ValueError(f"Invalid render kind {kind!r}, expected one of {RENDER_KINDS}")
+    figure = Figure(figsize=job.get("size", (6.4, 4.8)), dpi=job.get("dpi", 100))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    if kind == "walks":
+        walks = job["walks"] if "walks" in job else load_walks(job["source"])
+        street = job.get("street") or Street()
+        draw_walks(ax, walks, street, job.get("max_points", 200))
+    elif kind == "survival":
+        draw_survival_bars(ax, job["labels"], job["survival"], job["success"])
+    else:
+        draw_heatmap(ax, job["values"], job["rows"], job["columns"], job.get("label", "(%)"), job.get("title"))
+    if job.get("title") and kind != "heatmap":
+        ax.set_title(job["title"])
+    directory = os.path.dirname(job["path"])
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    figure.savefig(job["path"], bbox_inches="tight")
+    return job["path"], time.perf_counter() - start
+
+
+def render_batch(jobs, workers=None):
+    '''
+    Renders every job on a pool of workers processes (one per core by
+    default) and returns their (path, seconds) in job order
+    '''
+    jobs = list(jobs)
+    if workers == 1 or len(jobs) < 2:
+        use_agg()
+        return [render(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers, initializer=use_agg) as pool:
+        return list(pool.map(render, jobs))
+
+
+def sweep_jobs(summaries, directory, fmt="png"):
+    '''
+    Report figures of a CLI sweep: survival and success bars per hit
+    probability, plus one heatmap per rate over tasks and hit probabilities
+    '''
+    tasks = sorted({summary["task"] for summary in summaries})
+    points = sorted({summary["hit_probability"] for summary in summaries})
+    by_point = {(summary["task"], summary["hit_probability"]): summary for summary in summaries}
+    jobs = []
+    for p in points:
+        present = [task for task in tasks if (task, p) in by_point]
+        jobs.append({"kind": "survival", "path": os.path.join(directory, f"bars_p{p}.{fmt}"), "labels": present,
+                     "survival": [by_point[task, p]["survival_rate"] for task in present],
+                     "success": [by_point[task, p]["success_rate"] for task in present], "title": f"hit probability {p}"})
+    for rate in ("survival_rate", "success_rate"):
+        values = [[by_point[task, p][rate] if (task, p) in by_point else np.nan for p in points] for task in tasks]
+        jobs.append({"kind": "heatmap", "path": os.path.join(directory, f"{rate}.{fmt}"), "values": values,
+                     "rows": tasks, "columns": points, "title": rate.replace("_", " ")})
+    return jobs
+
+
+def load_jobs(path):
+    '''
+    Jobs from a JSON list or a JSON lines file
+    '''
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
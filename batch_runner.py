@@ -0,0 +1,157 @@
+'''
+Batch runner for scenario requests in JSON lines.
+
+Every input line is one request, e.g.
+
+    {"id": "b-low", "task": "B", "attempts": 100000, "hit_probability": 0.01, "priority": 2}
+
+with the options of run_scenario (task is required, the rest defaults like
+the CLI). Requests with the same configuration are run once and answered for
+every id. The distinct runs go to one process pool, highest priority first
+and, within a priority, cheapest first (or in input order), and one JSON
+result line per request is written as soon as its run is done.
+'''
+import json
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from kernels import KERNELS
+from runners import run_scenario
+from sampling import SAMPLING_MODES
+from simulation import ENGINE_CHOICES
+
+DEFAULTS = {"attempts": 10000, "seed": 43, "engine": "reference", "chunk_size": 10000, "hit_probability": None,
+            "sampling": "pseudo"}
+ORDERS = ("cheapest", "input")
+# rough cost of a walk relative to the reference engine, for the order only
+ENGINE_COST = {"reference": 1., "jump": 1., "fast_a": 0.2, "vectorized": 0.1, "auto": 0.1}
+TASK_COST = {"A": 1., "B": 2., "C": 2.}
+
+
+def read_requests(stream):
+    '''
+    (line number, request or error message) for every non-empty line
+    '''
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as error:
+            yield number, f"invalid JSON: {error}"
+            continue
+        yield number, request if isinstance(request, dict) else "a request must be a JSON object"
+
+
+def normalize(request):
+    '''
+    The full run_scenario configuration of a request; raises ValueError for
+    anything run_scenario would not accept
+    '''
+    unknown = set(request) - set(DEFAULTS) - {"id", "priority", "task"}
+    if unknown:
+        raise ValueError(f"unknown request fields {sorted(unknown)}")
+    if not isinstance(request.get("priority", 0), (int, float)):
+        raise ValueError("priority must be a number")
+    config = dict(DEFAULTS)
+    config.update({key: value for key, value in request.items() if key in DEFAULTS})
+    config["task"] = request.get("task")
+    if config["task"] not in KERNELS:
+        raise ValueError(f"Invalid Task {config['task']!r}, expected one of {tuple(KERNELS)}")
+    if config["engine"] not in ENGINE_CHOICES:
+        raise ValueError(f"Invalid engine {config['engine']!r}, expected one of {ENGINE_CHOICES}")
+    if config["sampling"] not in SAMPLING_MODES:
+        raise ValueError(f"Invalid sampling mode {config['sampling']!r}, expected one of {SAMPLING_MODES}")
+    if not isinstance(config["attempts"], int) or config["attempts"] < 1:
+        raise ValueError("attempts must be a positive integer")
+    return config
+
+
+def config_key(config):
+    return json.dumps(config, sort_keys=True)
+
+
+def request_cost(config):
+    return config["attempts"] * ENGINE_COST.get(config["engine"], 1.) * TASK_COST.get(config["task"], 2.)
+
+
+def run_config(config):
+    '''
+    What a worker runs for one distinct configuration: its summary
+    '''
+    summary, _, _ = run_scenario(config["task"], config["attempts"], config["seed"], config["engine"], "none", 1,
+                                 config["chunk_size"], config["hit_probability"], config["sampling"])
+    return summary
+
+
+def plan(lines, order="cheapest"):
+    '''
+    Groups the requests by configuration: returns the distinct configurations
+    in run order, their request ids, and error lines for invalid requests
+    '''
+    if order not in ORDERS:
+        raise ValueError(f"Invalid order {order!r}, expected one of {ORDERS}")
+    jobs, errors = {}, []
+    for position, (number, request) in enumerate(lines):
+        if isinstance(request, str):
+            errors.append({"id": None, "line": number, "error": request})
+            continue
+        request_id = request.get("id", number)
+        try:
+            config = normalize(request)
+        except ValueError as error:
+            errors.append({"id": request_id, "line": number, "error": str(error)})
+            continue
+        key = config_key(config)
+        if key not in jobs:
+            jobs[key] = {"config": config, "ids": [], "priority": request.get("priority", 0), "position": position}
+        jobs[key]["ids"].append(request_id)
+        jobs[key]["priority"] = max(jobs[key]["priority"], request.get("priority", 0))
+    if order == "cheapest":
+        ranking = lambda job: (-job["priority"], request_cost(job["config"]), job["position"])
+    else:
+        ranking = lambda job: (-job["priority"], job["position"])
+    return sorted(jobs.values(), key=ranking), errors
+
+
+def emit(out, result):
+    out.write(json.dumps(result) + "\n")
+    out.flush()
+
+
+def run_batch(lines, workers=1, order="cheapest", out=None):
+    '''
+    Runs the requests and streams one result line per request to out
+    (stdout by default) as runs complete; returns the number of requests
+    answered, errors included
+    '''
+    out = out or sys.stdout
+    jobs, errors = plan(lines, order)
+    for error in errors:
+        emit(out, error)
+    answered = len(errors)
+
+    def answer(job, summary=None, error=None):
+        for request_id in job["ids"]:
+            emit(out, {"id": request_id, **summary} if error is None else {"id": request_id, "error": error})
+        return len(job["ids"])
+
+    if workers <= 1:
+        for job in jobs:
+            try:
+                answered += answer(job, run_config(job["config"]))
+            except (TypeError, ValueError) as error: # a bad field value surfaced by the run
+                answered += answer(job, error=str(error))
+        return answered
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # the pool starts tasks in submission order, so this is the run order
+        pending = {pool.submit(run_config, job["config"]): job for job in jobs}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = pending.pop(future)
+                try:
+                    answered += answer(job, future.result())
+                except (TypeError, ValueError) as error:
+                    answered += answer(job, error=str(error))
+    return answered
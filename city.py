@@ -0,0 +1,190 @@
+'''
+Route mode: getting home through a city.
+
+A City is a graph of intersections whose edges are streets, each a Street
+layout crossed by a walker of one task. How a crossing ends only depends on
+the street's layout, its hit probability and the task, so every distinct
+configuration is solved once (exactly for task A, see exact.py, otherwise by
+simulation) and its CrossingResult is memoized in a CrossingCache. Routes are
+composed from the cached results: the walker crosses the streets one after
+the other, and a walker who ends up back on the sidewalk he started from
+simply tries again. The safest way home is a Dijkstra search with edge
+weights -log(survival).
+'''
+import heapq
+import json
+import math
+
+from simulation import Scenario, Street
+
+
+def street_signature(street):
+    '''
+    Hashable description of everything about a street that matters to a crossing
+    '''
+    return (tuple((zone.zone_type, float(zone.length)) for zone in street.zones),
+            float(street.probability_of_hit_on_danger_zone))
+
+
+class CrossingResult:
+    '''
+    Outcome distribution of one attempt at crossing a street: the
+    probabilities of success, stay and crash, and the mean time an attempt
+    takes (Drunk.time). walks is the number of simulated walks behind it,
+    None for an exact result.
+    '''
+    def __init__(self, success, stay, crash, mean_time, walks=None):
+        self.success = success
+        self.stay = stay
+        self.crash = crash
+        self.mean_time = mean_time
+        self.walks = walks
+
+    def survival(self, retry=True):
+        '''
+        Probability of reaching the other side. With retry, walkers that
+        stayed on their sidewalk try again until they cross or crash.
+        '''
+        if not retry:
+            return self.success
+        return self.success / (1 - self.stay) if self.stay < 1 else 0.
+
+    def expected_time(self, retry=True):
+        '''
+        Expected time spent on the street, over every attempt made
+        '''
+        if not retry:
+            return self.mean_time
+        return self.mean_time / (1 - self.stay) if self.stay < 1 else math.inf
+
+    def to_dict(self):
+        return {"success": self.success, "stay": self.stay, "crash": self.crash, "mean_time": self.mean_time,
+                "walks": self.walks}
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(values["success"], values["stay"], values["crash"], values["mean_time"], values["walks"])
+
+
+class CrossingCache:
+    '''
+    Memoized CrossingResults per (task, street signature). Task A streets are
+    solved exactly unless exact is off; everything else is simulated with
+    attempts walks.
+    '''
+    def __init__(self, attempts=10000, seed=43, engine="vectorized", exact=True):
+        self.attempts = attempts
+        self.seed = seed
+        self.engine = engine
+        self.exact = exact
+        self.results = {}
+        self.solved = 0 # streets solved or simulated so far, i.e. cache misses
+
+    def get(self, task, street):
+        key = (task, street_signature(street))
+        if key not in self.results:
+            self.results[key] = self.solve(task, street)
+            self.solved += 1
+        return self.results[key]
+
+    def solve(self, task, street):
+        if task == "A" and self.exact:
+            from exact import task_a_hitting_times
+
+            times = task_a_hitting_times(street)
+            return CrossingResult(float(times.success.sum()), 0., float(times.crash.sum()), times.mean_steps())
+        scenario = Scenario(self.attempts, task, seed=self.seed, engine=self.engine, record="none", street=street)
+        scenario.run_codes()
+        tally = scenario.table.tally()
+        return CrossingResult(tally.success / tally.total, tally.stay / tally.total, tally.crash / tally.total,
+                              float(scenario.table["time"].mean()), tally.total)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump([{"task": task, "signature": signature, **result.to_dict()}
+                       for (task, signature), result in self.results.items()], f)
+
+    def load(self, path):
+        with open(path) as f:
+            for entry in json.load(f):
+                zones, hit_probability = entry["signature"]
+                signature = (tuple((zone_type, length) for zone_type, length in zones), hit_probability)
+                self.results[(entry["task"], signature)] = CrossingResult.from_dict(entry)
+
+
+class City:
+    '''
+    Intersections joined by streets. Streets can be crossed both ways, by
+    walkers of the City's task unless a street says otherwise.
+    '''
+    def __init__(self, task="B", cache=None, retry=True):
+        self.task = task
+        self.cache = cache or CrossingCache()
+        self.retry = retry
+        self.streets = {} # intersection -> list of (neighbour, street, task)
+
+    def add_street(self, a, b, street=None, task=None):
+        street = street or Street()
+        self.streets.setdefault(a, []).append((b, street, task or self.task))
+        self.streets.setdefault(b, []).append((a, street, task or self.task))
+
+    def crossing(self, street, task):
+        return self.cache.get(task, street)
+
+    def edge_survival(self, street, task):
+        return self.crossing(street, task).survival(self.retry)
+
+    def route_result(self, route):
+        '''
+        Survival and expected time along a route given as its intersections.
+        Between two neighbouring intersections the safest street is taken.
+        '''
+        survival, time = 1., 0.
+        for a, b in zip(route, route[1:]):
+            options = [self.crossing(street, task) for neighbour, street, task in self.streets.get(a, []) if neighbour == b]
+            if not options:
+                raise ValueError(f"no street between {a!r} and {b!r}")
+            best = max(options, key=lambda result: result.survival(self.retry))
+            survival *= best.survival(self.retry)
+            time += best.expected_time(self.retry)
+        return survival, time
+
+    def safest_routes(self, source):
+        '''
+        Dijkstra on -log(survival) from source: for every reachable
+        intersection its survival probability and the route, source first
+        '''
+        cost = {source: 0.}
+        previous = {}
+        heap = [(0., 0, source)]
+        counter = 1 # tie breaker, intersections need not be comparable
+        done = set()
+        while heap:
+            distance, _, node = heapq.heappop(heap)
+            if node in done:
+                continue
+            done.add(node)
+            for neighbour, street, task in self.streets.get(node, []):
+                survival = self.edge_survival(street, task)
+                if survival <= 0:
+                    continue
+                candidate = distance - math.log(survival)
+                if candidate < cost.get(neighbour, math.inf):
+                    cost[neighbour] = candidate
+                    previous[neighbour] = node
+                    heapq.heappush(heap, (candidate, counter, neighbour))
+                    counter += 1
+        routes = {}
+        for node, distance in cost.items():
+            route = [node]
+            while route[-1] != source:
+                route.append(previous[route[-1]])
+            routes[node] = (math.exp(-distance), route[::-1])
+        return routes
+
+    def safest_route(self, source, home):
+        '''
+        The route from source to home with the highest survival probability:
+        (survival, route), or (0., None) when home cannot be reached alive
+        '''
+        return self.safest_routes(source).get(home, (0., None))
@@ -0,0 +1,262 @@
+'''
+Event-driven mode for walkers, cars and hazards in continuous time.
+
+Scenario plays one walk after the other and traffic.py advances everybody
+tick by tick. Here every agent has a next event time in one binary heap and
+only the agent whose event is due is advanced, in O(log n) per event, so
+walkers of task C (exponential step times) and walkers of other tasks, cars
+and time-varying hazards interleave correctly without any fixed tick.
+
+A walker's step takes one time unit, or its exponential time step in task C,
+and the walker counts as standing where the step took it for that time.
+Hits come from:
+  - the street's flat hit probability, checked once per step in a dangerous
+    zone like Grid does (the default, so results follow the reference engine;
+    set it to 0 to only have cars),
+  - or a hazard: a PiecewiseRate of hits per time unit, integrated over the
+    time spent in a dangerous zone,
+  - and cars, arriving in every lane (dangerous zone) as a Poisson process
+    and hitting a walker of the lane they pass within reach of.
+'''
+import bisect
+import heapq
+import itertools
+import math
+import random
+
+import numpy as np
+
+from kernels import get_kernel
+from simulation import OUTCOME_CODES, Drunk, Street, WalkTable
+
+
+class PiecewiseRate:
+    '''
+    A rate that is values[k] from times[k] until times[k + 1] (the last value
+    holds forever), repeating every period when one is given; e.g. traffic
+    lights or rush hours
+    '''
+    def __init__(self, times, values, period=None):
+        self.times = np.asarray(times, dtype=float)
+        self.values = np.asarray(values, dtype=float)
+        self.period = period
+        if self.times[0] != 0 or np.any(np.diff(self.times) <= 0) or len(self.times) != len(self.values):
+            raise ValueError("times must start at 0 and increase, with one value per time")
+        if period and self.times[-1] >= period:
+            raise ValueError("every time must lie within the period")
+        ends = np.append(self.times[1:], period if period else self.times[-1])
+        self.cumulative = np.concatenate(([0.], np.cumsum(self.values[:-1] * np.diff(self.times))))
+        self.cycle = float(self.cumulative[-1] + self.values[-1] * (ends[-1] - self.times[-1])) if period else None
+
+    def value(self, t):
+        if self.period:
+            t %= self.period
+        return float(self.values[bisect.bisect_right(self.times, t) - 1])
+
+    def maximum(self):
+        return float(self.values.max())
+
+    def cumulated(self, t):
+        '''
+        Integral of the rate from 0 to t
+        '''
+        cycles = 0.
+        if self.period:
+            cycles, t = divmod(t, self.period)
+        k = bisect.bisect_right(self.times, t) - 1
+        return cycles * (self.cycle or 0.) + float(self.cumulative[k] + self.values[k] * (t - self.times[k]))
+
+    def integral(self, start, end):
+        return self.cumulated(end) - self.cumulated(start)
+
+
+class EventQueue:
+    '''
+    Binary heap of (time, sequence, agent); the sequence number keeps events
+    at equal times in scheduling order
+    '''
+    def __init__(self):
+        self.heap = []
+        self.sequence = itertools.count()
+
+    def push(self, time, agent):
+        heapq.heappush(self.heap, (time, next(self.sequence), agent))
+
+    def pop(self):
+        time, _, agent = heapq.heappop(self.heap)
+        return time, agent
+
+    def __len__(self):
+        return len(self.heap)
+
+
+class Walker:
+    '''
+    One drunk; an event is the end of his current step
+    '''
+    def __init__(self, row, task, rng):
+        self.row = row # row of the WalkTable
+        self.drunk = Drunk(task, rng=rng)
+        self.steps = 0
+        self.since = None # time he got to a dangerous zone, None elsewhere
+        self.zone = None
+
+    def fire(self, simulation, now):
+        return simulation.walker_event(self, now)
+
+
+class CarSource:
+    '''
+    Cars entering one lane as a Poisson process of the given rate (cars per
+    time unit, a number or a PiecewiseRate), drawn by thinning
+    '''
+    def __init__(self, lane, rate, rng):
+        self.lane = lane
+        self.rate = rate if isinstance(rate, PiecewiseRate) else PiecewiseRate([0.], [rate])
+        self.rng = rng
+        self.bound = self.rate.maximum()
+
+    def next_arrival(self, now):
+        while self.bound > 0:
+            now += self.rng.expovariate(self.bound)
+            if self.rng.random() * self.bound < self.rate.value(now):
+                return now
+        return None
+
+    def fire(self, simulation, now):
+        simulation.arrivals[self.lane].append(now)
+        return self.next_arrival(now)
+
+
+class EventSimulation:
+    '''
+    Walkers crossing a Street, each with its own task (one task for all or a
+    list), starting at start_times (all at 0 by default). Cars drive along
+    a road of road_length meters at car_speed, entering just out of reach
+    of its ends, with lanes alternating direction like in traffic.py; the
+    walkers' x is taken modulo road_length.
+    '''
+    def __init__(self, walkers, tasks="C", street=None, hazard=None, car_rate=0., car_speed=4., reach=2.55,
+                 road_length=200., start_times=None, seed=43):
+        self.street = street or Street()
+        self.rng = random.Random(seed)
+        self.hazard = hazard
+        self.car_speed = car_speed
+        self.reach = reach # largest distance at which a car hits a walker
+        self.road_length = road_length
+        self.size = self.street.get_street_size()
+        self.danger = self.street.get_danger_mask()
+        self.lane_zones = np.flatnonzero(self.danger)
+        self.lane_of_zone = {int(zone): lane for lane, zone in enumerate(self.lane_zones)}
+        self.arrivals = [[] for _ in self.lane_zones] # entry times of the cars of every lane, in order
+        tasks = [tasks] * walkers if isinstance(tasks, str) else list(tasks)
+        if len(tasks) != walkers:
+            raise ValueError(f"{len(tasks)} tasks for {walkers} walkers")
+        for task in set(tasks):
+            get_kernel(task)
+
+        self.table = WalkTable.empty(walkers)
+        self.table["crash_zone"][:] = -1
+        self.queue = EventQueue()
+        self.active = walkers
+        self.events = 0
+        start_times = np.zeros(walkers) if start_times is None else np.asarray(start_times, dtype=float)
+        for row, (task, start) in enumerate(zip(tasks, start_times)):
+            walker = Walker(row, task, self.rng)
+            walker.drunk.position = (self.rng.uniform(0, road_length), walker.drunk.position[1])
+            walker.drunk.first_step() # straight ahead, without checks, like Scenario
+            walker.steps = 1
+            self.queue.push(float(start), walker)
+        if car_rate:
+            for lane in range(len(self.lane_zones)):
+                source = CarSource(lane, car_rate, self.rng)
+                first = source.next_arrival(0.)
+                if first is not None:
+                    self.queue.push(first, source)
+
+    def car_passed(self, lane, x, start, end):
+        '''
+        Did a car of the lane come within reach of x between start and end?
+        '''
+        x %= self.road_length
+        entry = -self.reach if lane % 2 == 0 else self.road_length + self.reach
+        distance = abs(x - entry) # at least reach, so later cars cannot have reached x yet
+        arrivals = self.arrivals[lane]
+        first = bisect.bisect_left(arrivals, start - (distance + self.reach) / self.car_speed)
+        return first < len(arrivals) and arrivals[first] <= end - (distance - self.reach) / self.car_speed
+
+    def hit(self, walker, now):
+        '''
+        Was the walker hit while standing in his dangerous zone since walker.since?
+        '''
+        x = walker.drunk.position[0]
+        if self.arrivals and self.car_passed(self.lane_of_zone[walker.zone], x, walker.since, now):
+            return True
+        if self.hazard is not None:
+            return self.rng.random() < 1 - math.exp(-self.hazard.integral(walker.since, now))
+        return self.rng.random() < self.street.probability_of_hit_on_danger_zone
+
+    def finish(self, walker, code, now):
+        row = walker.row
+        self.table["outcome"][row] = code
+        self.table["steps"][row] = walker.steps
+        self.table["time"][row] = now
+        self.table["final_x"][row], self.table["final_y"][row] = walker.drunk.position
+        if code == OUTCOME_CODES["crash"]:
+            self.table["crash_zone"][row] = walker.zone
+        self.active -= 1
+        return None
+
+    def walker_event(self, walker, now):
+        '''
+        The walker's step is over: settle the hazards of where he stood, then
+        take the next step and return when it ends (None once he is done)
+        '''
+        if walker.since is not None and self.hit(walker, now):
+            return self.finish(walker, OUTCOME_CODES["crash"], now)
+        before = walker.drunk.time
+        walker.drunk.move()
+        walker.steps += 1
+        # Drunk.move counts one time unit per step; task C adds its exponential time step on top
+        duration = walker.drunk.time - before - 1 or 1.
+        y = walker.drunk.position[1]
+        if y >= self.size:
+            return self.finish(walker, OUTCOME_CODES["success"], now)
+        if y < 0:
+            return self.finish(walker, OUTCOME_CODES["stay"], now)
+        walker.zone = self.street.get_zone_index_at_position(y)
+        walker.since = None
+        if self.danger[walker.zone]:
+            walker.since = now
+            self.table["danger_exposure"][walker.row] += 1
+        return now + duration
+
+    def run(self, until=None):
+        '''
+        Processes events in time order until every walker is done (or the
+        clock passes until) and returns the WalkTable; time is the clock
+        time each walk ended
+        '''
+        while self.active and len(self.queue):
+            now, agent = self.queue.pop()
+            if until is not None and now > until:
+                self.queue.push(now, agent)
+                break
+            self.events += 1
+            following = agent.fire(self, now)
+            if following is not None:
+                self.queue.push(following, agent)
+        return self.table
+
+
+if __name__ == "__main__":
+    from simulation import probability_computing
+
+    lights = PiecewiseRate([0., 30.], [0.4, 0.], period=60.) # cars for 30 time units out of every 60
+    for name, simulation in [("flat", EventSimulation(10000, "C")),
+                             ("mixed + cars", EventSimulation(10000, ["A", "B", "C"] * 3333 + ["C"], car_rate=lights,
+                                                              start_times=np.linspace(0., 120., 10000)))]:
+        table = simulation.run()
+        probability = probability_computing(table.tally())
+        print(f"{name}: survival {probability.computing_survival_rate():.1f}%, "
+              f"success {probability.success_to_the_other_side():.1f}%, {simulation.events} events")
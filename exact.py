@@ -0,0 +1,99 @@
+'''
+Exact hitting-time distributions for task A.
+
+In task A the vertical position only takes the values k * velocity and only
+the vertical position decides how a walk ends, so instead of simulating walks
+the probability mass over that lattice is propagated one step at a time. The
+mass absorbed by crashes and by reaching the other side at every step gives
+P(outcome at step t) directly.
+'''
+import numpy as np
+
+from simulation import Drunk, Street
+
+
+class HittingTimes:
+    '''
+    Distribution of the step (Drunk.time) at which task A walks end.
+    crash[t], success[t] and stay[t] are the probabilities of ending that way
+    at step t; crash_by_zone[t, z] splits crash[t] over Street.zones.
+    '''
+    def __init__(self, crash, success, crash_by_zone, remaining):
+        self.steps = np.arange(len(crash))
+        self.crash = crash
+        self.success = success
+        self.stay = np.zeros_like(crash) # a task A walker never steps backwards
+        self.crash_by_zone = crash_by_zone
+        self.remaining = remaining # mass still on the street after the last step
+
+    def still_walking(self):
+        '''
+        S(t) = P(T > t), probability that the walk has not ended after step t
+        '''
+        return 1. - np.cumsum(self.crash + self.success + self.stay)
+
+    def survival(self):
+        '''
+        Probability of not having been hit by step t
+        '''
+        return 1. - np.cumsum(self.crash)
+
+    def survival_rate(self):
+        '''
+        Percentage of walks that do not crash, like probability_computing
+        '''
+        return (1. - self.crash.sum()) * 100
+
+    def success_rate(self):
+        return self.success.sum() * 100
+
+    def mean_steps(self):
+        '''
+        Expected number of steps, conditional on the walk having ended
+        '''
+        ended = self.crash + self.success + self.stay
+        return float((self.steps * ended).sum() / ended.sum())
+
+
+def task_a_hitting_times(street=None, velocity=None, tolerance=1e-12, max_steps=100000):
+    '''
+    Propagates the task A probability mass over the y lattice of the street
+    until less than tolerance of it is left on the street (or max_steps).
+    Follows Scenario.run_single_game: an unchecked first step straight ahead,
+    then per step a move (1/2 sideways, 1/2 forward) and the Grid checks.
+    '''
+    street = street or Street()
+    velocity = Drunk("A").velocity if velocity is None else velocity
+    size = street.get_street_size()
+    levels = int(np.ceil(size / velocity))   # lattice points k * velocity still on the street
+    zone = street.get_zone_indices(np.arange(levels) * velocity)
+    danger = np.zeros(levels)
+    in_zone = zone >= 0
+    danger[in_zone] = street.get_danger_mask()[zone[in_zone]]
+    hit = danger * street.probability_of_hit_on_danger_zone
+
+    mass = np.zeros(levels + 1)   # the last entry is "reached the other side"
+    mass[min(1, levels)] = 1.   # first_step: straight ahead, no checks
+    crash, success, crash_by_zone = [0.], [0.], [np.zeros(len(street.zones))]
+    for t in range(1, max_steps + 1):
+        moved = 0.5 * mass
+        moved[1:] += 0.5 * mass[:-1]
+        moved[-1] += 0.5 * mass[-1]   # the other side keeps its mass; only the first step can put some there
+        crashed = moved[:-1] * hit
+        moved[:-1] -= crashed
+        by_zone = np.zeros(len(street.zones))
+        np.add.at(by_zone, zone[in_zone], crashed[in_zone])
+        crash.append(crashed.sum())
+        crash_by_zone.append(by_zone)
+        success.append(moved[-1])
+        moved[-1] = 0.
+        mass = moved
+        if mass.sum() < tolerance:
+            break
+    return HittingTimes(np.array(crash), np.array(success), np.array(crash_by_zone), mass.sum())
+
+
+if __name__ == "__main__":
+    times = task_a_hitting_times()
+    print(f"survival {times.survival_rate():.4f}%, success {times.success_rate():.4f}%, "
+          f"mean steps {times.mean_steps():.3f}, {len(times.steps)} steps resolved")
@@ -0,0 +1,90 @@
+'''
+Hit-probability-free results.
+
+Where the drunk walks does not depend on the hit probability; a collision
+only decides when the walk stops. So walks are simulated without collisions
+to the sidewalk, counting the steps k_z they end in every dangerous zone z.
+The chance that such a walk is never hit is prod_z (1 - p_z) ** k_z, and
+averaging it over the walks gives the survival (and success) probability for
+any hit probabilities p, without simulating again.
+'''
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+
+class ExposureTable:
+    '''
+    Danger-zone exposure counts of collision-free walks. counts[i, z] is the
+    number of steps walk i ended in the z-th dangerous zone (zones[z] is its
+    index into Street.zones); success[i] tells whether walk i reached the
+    other side rather than the sidewalk it started from.
+    '''
+    def __init__(self, counts, success, zones):
+        self.counts = counts
+        self.success = success
+        self.zones = zones
+        # walks with the same exposure counts have the same weight for every p
+        self.unique_counts, inverse = np.unique(counts, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        self.multiplicity = np.bincount(inverse, minlength=len(self.unique_counts))
+        self.success_multiplicity = np.bincount(inverse[success], minlength=len(self.unique_counts))
+
+    @classmethod
+    def concatenate(cls, tables):
+        return cls(np.concatenate([table.counts for table in tables]),
+                   np.concatenate([table.success for table in tables]), tables[0].zones)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def hit_probabilities(self, points):
+        '''
+        Broadcasts a list of points, each a single hit probability or one per
+        dangerous zone, to an (m, zones) array
+        '''
+        points = np.asarray(points, dtype=float)
+        if points.ndim == 1:
+            points = points[:, None]
+        return np.broadcast_to(points, (len(points), len(self.zones)))
+
+    def unique_weights(self, points):
+        '''
+        Survival probability of every distinct exposure vector, for every point: (unique, m)
+        '''
+        keep = 1. - self.hit_probabilities(points)
+        return np.prod(keep[None, :, :] ** self.unique_counts[:, None, :], axis=2)
+
+    def survival_curve(self, points):
+        '''
+        Survival rate in percent for each point of a list of hit probabilities
+        '''
+        return self.multiplicity @ self.unique_weights(points) / len(self) * 100
+
+    def success_curve(self, points):
+        '''
+        Success rate in percent for each point of a list of hit probabilities
+        '''
+        return self.success_multiplicity @ self.unique_weights(points) / len(self) * 100
+
+    def survival_rate(self, hit_probability):
+        '''
+        Survival rate in percent for one hit probability (or one per dangerous zone)
+        '''
+        return float(self.survival_curve([hit_probability])[0])
+
+    def success_rate(self, hit_probability):
+        return float(self.success_curve([hit_probability])[0])
+
+    def confidence_interval(self, hit_probability, rate="survival", level=0.95):
+        '''
+        Normal confidence interval, in percent, of the reweighted estimate
+        '''
+        weights = self.unique_weights([hit_probability])[:, 0]
+        multiplicity = self.multiplicity if rate == "survival" else self.success_multiplicity
+        n = len(self)
+        mean = (multiplicity * weights).sum() / n
+        variance = ((multiplicity * weights**2).sum() / n - mean**2) / max(n - 1, 1)
+        half_width = NormalDist().inv_cdf(0.5 + level / 2) * math.sqrt(max(variance, 0.))
+        return (float(max(mean - half_width, 0.)) * 100, float(min(mean + half_width, 1.)) * 100)
@@ -0,0 +1,181 @@
+'''
+Incremental re-simulation when the street layout changes.
+
+An IncrementalRun plays replayable walks: walk i draws from the
+CounterStreams of (seed, i), like Scenario(replayable=True), so it gives the
+same WalkTable. For every walk it also keeps the y-extent of the positions
+it checked and one checkpoint per zone it entered: the step, the zone's
+[low, high) span, the drunk's state and the positions of both random streams
+when he first got there.
+
+update(street) compares the old and the new layout and finds the stretches
+of street where a position is now treated differently (another zone type,
+another hit probability, on or off the street). Only the walks that entered
+a zone overlapping such a stretch are played again, each from its first such
+checkpoint: before that point the walk never stood anywhere the edit changed,
+and its streams carry on from the same counters, so the result is exactly
+what a full rerun on the new street gives. Every other row is kept.
+'''
+import bisect
+import copy
+import math
+
+import numpy as np
+
+from kernels import get_kernel
+from sampling import CounterStream
+from simulation import OUTCOME_CODES, Drunk, Grid, Street, WalkTable
+
+
+def position_class(street, y):
+    '''
+    What standing at y means on a street: "safe", ("dangerous", hit
+    probability), or "off" past either end
+    '''
+    index = street.get_zone_index_at_position(y)
+    if index is None:
+        return "off"
+    if street.zones[index].zone_type == "dangerous":
+        return ("dangerous", street.probability_of_hit_on_danger_zone)
+    return "safe"
+
+
+def changed_stretches(old, new):
+    '''
+    Merged [low, high) stretches of y where the two streets treat a position
+    differently. Between two consecutive edges of either street nothing
+    changes, so one position per piece is enough.
+    '''
+    points = np.union1d(old.get_zone_edges(), new.get_zone_edges())
+    stretches = []
+    for low, high in zip(points[:-1].tolist(), points[1:].tolist()):
+        middle = (low + high) / 2
+        if position_class(old, middle) == position_class(new, middle):
+            continue
+        if stretches and stretches[-1][1] == low:
+            stretches[-1][1] = high
+        else:
+            stretches.append([low, high])
+    return [tuple(stretch) for stretch in stretches]
+
+
+def overlaps(low, high, stretches):
+    return any(low < end and start < high for start, end in stretches)
+
+
+class IncrementalRun:
+    '''
+    attempts replayable walks of a task on a street, with the per-walk
+    extents and zone checkpoints that let update() re-simulate only what a
+    layout edit touches. Walks are played like the reference engine.
+    '''
+    def __init__(self, attempts, task, street=None, seed=43):
+        self.attempts = attempts
+        self.task = task
+        self.kernel = get_kernel(task)
+        self.seed = seed
+        self.street = copy.deepcopy(street or Street()) # a copy, so that edits made in place show up as changes
+        self.table = None
+        self.low = np.full(attempts, math.inf) # lowest y checked by each walk (an upper bound after updates)
+        self.high = np.full(attempts, -math.inf) # highest y checked by each walk (likewise)
+        self.checkpoints = [[] for _ in range(attempts)] # per walk: (step, low, high, state), in step order
+        self.replayed = 0 # walks played again by updates so far
+
+    def run(self):
+        '''
+        Plays every walk and returns the WalkTable
+        '''
+        self.table = WalkTable.empty(self.attempts)
+        for i in range(self.attempts):
+            self.play(i)
+        return self.table
+
+    def play(self, i, checkpoint=None):
+        '''
+        Plays walk i on self.street from its start, or from a checkpoint
+        (step, low, high, state) of an earlier run, and records its row,
+        extent and checkpoints
+        '''
+        movement, collisions = CounterStream(self.seed, i, 0), CounterStream(self.seed, i, 1)
+        drunk = Drunk(self.task, rng=movement, kernel=self.kernel)
+        grid = Grid(drunk, self.street, rng=collisions)
+        edges = self.street.get_zone_edges().tolist()
+        spans = edges + [math.inf] # zone len(zones) is past the far end of the street
+        if checkpoint is None:
+            drunk.first_step()
+            steps, resume = 1, False
+        else:
+            steps, _, _, (drunk.position, drunk.old_direction, drunk.time, movement.counter, collisions.counter,
+                          grid.danger_exposure) = checkpoint
+            resume = True # the checkpoint was taken after the move, before the checks
+        checkpoints = self.checkpoints[i]
+        entered = set()
+        low, high = self.low[i], self.high[i]
+        while True:
+            if resume:
+                resume = False
+            else:
+                drunk.move()
+                steps += 1
+            y = drunk.position[1]
+            if y >= 0:
+                zone = bisect.bisect_right(edges, y) - 1
+                if zone not in entered:
+                    entered.add(zone)
+                    state = (drunk.position, getattr(drunk, "old_direction", 0), drunk.time, movement.counter,
+                             collisions.counter, grid.danger_exposure) # task A walkers have no heading
+                    checkpoints.append((steps, spans[zone], spans[zone + 1], state))
+            low, high = min(low, y), max(high, y)
+            reason = grid.finished_game()
+            if reason:
+                break
+        self.low[i], self.high[i] = low, high
+        self.table.record(i, OUTCOME_CODES[reason], steps, drunk, grid)
+
+    def update(self, street):
+        '''
+        Moves the run to an edited street (a new Street or the old one edited
+        in place) and re-simulates the walks the edit can change, from their
+        first checkpoint in a changed stretch. Returns their indices.
+        '''
+        if self.table is None:
+            self.run()
+        stretches = changed_stretches(self.street, street)
+        self.street = copy.deepcopy(street)
+        candidates = np.zeros(self.attempts, dtype=bool)
+        for start, end in stretches:
+            candidates |= (self.low < end) & (self.high >= start)
+        replayed = []
+        for i in np.flatnonzero(candidates).tolist():
+            checkpoints = self.checkpoints[i]
+            first = next((k for k, (_, low, high, _) in enumerate(checkpoints) if overlaps(low, high, stretches)), None)
+            if first is None:
+                continue # his extent overlaps, but he never stood in a changed stretch
+            checkpoint = checkpoints[first]
+            del checkpoints[first:]
+            self.play(i, checkpoint)
+            replayed.append(i)
+        # the zones of the kept crashes are the same kind of zone, but their index may have moved
+        crashes = self.table["outcome"] == OUTCOME_CODES["crash"]
+        self.table["crash_zone"][crashes] = self.street.get_zone_indices(self.table["final_y"][crashes])
+        self.replayed += len(replayed)
+        return np.array(replayed, dtype=np.int64)
+
+
+if __name__ == "__main__":
+    import time
+
+    from simulation import probability_computing
+
+    run = IncrementalRun(20000, "B")
+    start = time.perf_counter()
+    run.run()
+    print(f"full run: {time.perf_counter() - start:.2f} s, "
+          f"survival {probability_computing(run.table.tally()).computing_survival_rate():.2f}%")
+    street = copy.deepcopy(run.street)
+    for width in (2.5, 3., 3.5):
+        street.zones[3].length = width # widen the second dangerous zone
+        start = time.perf_counter()
+        replayed = run.update(street)
+        print(f"second dangerous zone {width} m: {len(replayed)} walks replayed in {time.perf_counter() - start:.2f} s, "
+              f"survival {probability_computing(run.table.tally()).computing_survival_rate():.2f}%")
@@ -0,0 +1,90 @@
+'''
+First-exit jumps for tasks B and C.
+
+Nothing can end a walk while the drunk wanders inside a safe zone of the
+street, so when he is at least h away from both borders of the zone the steps
+until he first moves h up or down can be skipped: the exit point, the heading
+there and the steps and time it took are drawn from a table of precomputed
+excursions instead. Excursions are simulated once per (task, velocity) for a
+few band half-widths h and for binned starting headings; the start heading is
+rounded to the centre of its bin, which is the only approximation.
+'''
+import math
+
+import numpy as np
+
+from kernels import WalkerArrays, get_kernel
+
+EXIT_TABLES = {} # (task, velocity, levels, bins, samples) -> ExitTable
+
+
+class ExitTable:
+    '''
+    Samples of the first exit of a task B or C walk from the band |dy| < h,
+    for every half-width in levels (in units of the step length velocity)
+    and every starting heading bin. Arrays are indexed [level, bin, sample].
+    '''
+    def __init__(self, task, velocity, levels=(2, 4, 8, 16), bins=72, samples=256, seed=0):
+        self.task = task
+        self.velocity = velocity
+        self.levels = levels
+        self.half_widths = [level * velocity for level in levels]
+        self.bins = bins
+        self.samples = samples
+        shape = (len(levels), bins, samples)
+        self.dx, self.dy, self.turn, self.time = (np.empty(shape) for _ in range(4))
+        self.steps = np.empty(shape, dtype=np.int64)
+        generator = np.random.default_rng(seed)
+        for j, half_width in enumerate(self.half_widths):
+            self.simulate(j, half_width, generator)
+
+    def simulate(self, j, half_width, generator):
+        '''
+        Runs samples excursions for every heading bin at once until they all
+        left the band
+        '''
+        kernel = get_kernel(self.task)
+        walkers = WalkerArrays(self.bins * self.samples)
+        start = np.repeat(np.arange(self.bins) * 2 * math.pi / self.bins, self.samples)
+        walkers.heading[:] = start
+        steps = np.zeros(len(start), dtype=np.int64)
+        active = np.arange(len(start))
+        while len(active):
+            kernel.batch_step(walkers, active, self.velocity, generator)
+            walkers.time[active] += 1
+            steps[active] += 1
+            active = active[np.abs(walkers.y[active]) < half_width]
+        shape = (self.bins, self.samples)
+        self.dx[j], self.dy[j] = walkers.x.reshape(shape), walkers.y.reshape(shape)
+        self.turn[j] = (walkers.heading - start).reshape(shape)
+        self.steps[j], self.time[j] = steps.reshape(shape), walkers.time.reshape(shape)
+
+    def level_for(self, distance):
+        '''
+        Largest band index whose half-width fits in distance, None if none does
+        '''
+        best = None
+        for j, half_width in enumerate(self.half_widths):
+            if half_width <= distance:
+                best = j
+        return best
+
+    def sample(self, j, heading, u):
+        '''
+        One excursion for band j from the given heading, picked with the uniform u:
+        (dx, dy, turn, steps, time)
+        '''
+        heading_bin = int(round((heading % (2 * math.pi)) / (2 * math.pi) * self.bins)) % self.bins
+        k = min(int(u * self.samples), self.samples - 1)
+        return (float(self.dx[j, heading_bin, k]), float(self.dy[j, heading_bin, k]), float(self.turn[j, heading_bin, k]),
+                int(self.steps[j, heading_bin, k]), float(self.time[j, heading_bin, k]))
+
+
+def get_exit_table(task, velocity, levels=(2, 4, 8, 16), bins=72, samples=256):
+    '''
+    Builds the exit table of a task once per process and caches it
+    '''
+    key = (task, velocity, tuple(levels), bins, samples)
+    if key not in EXIT_TABLES:
+        EXIT_TABLES[key] = ExitTable(task, velocity, tuple(levels), bins, samples)
+    return EXIT_TABLES[key]
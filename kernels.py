@@ -0,0 +1,194 @@
+'''
+Movement kernels: how a drunk moves, one kernel per task or walk model.
+
+Every kernel has a scalar step, used by Drunk on one walker, and a batch step
+that moves an array of walkers at once (any object with x, y, heading and
+time arrays). Kernels are looked up by name once per Scenario, so adding a
+model means registering a kernel here rather than editing Drunk.move.
+'''
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+TURNING_ANGLES = np.linspace(-2/3 * np.pi, 2/3 *np.pi, 240) # Possible turning angles in radians for task B
+
+KERNELS = {} # name -> MovementKernel
+
+
+def register_kernel(kernel):
+    '''
+    Adds a kernel instance to the registry under its name; usable as a class decorator
+    '''
+    if isinstance(kernel, type):
+        KERNELS[kernel.name] = kernel()
+        return kernel
+    KERNELS[kernel.name] = kernel
+    return kernel
+
+
+def get_kernel(name):
+    if name not in KERNELS:
+        raise ValueError(f"Invalid Task {name!r}, expected one of {tuple(KERNELS)}")
+    return KERNELS[name]
+
+
+class WalkerArrays:
+    '''
+    Positions, headings and times of many walkers, for the batch steps
+    '''
+    def __init__(self, n):
+        self.x = np.zeros(n)
+        self.y = np.zeros(n)
+        self.heading = np.zeros(n)
+        self.time = np.zeros(n)
+
+
+class MovementKernel:
+    '''
+    Base kernel. step and batch_step move the walker(s) once; the caller adds
+    the unit time increment of Drunk.move. The first step goes straight ahead
+    by the walk speed unless a kernel says otherwise.
+    '''
+    name = None
+
+    def start(self, drunk):
+        drunk.old_direction = 0 #Heading direction
+        drunk.position = (0., 0.)
+
+    def first_step(self, drunk):
+        drunk.position = (drunk.position[0], drunk.position[1] + drunk.velocity)
+
+    def step(self, drunk):
+        raise NotImplementedError
+
+    def batch_first_step(self, walkers, index, velocity, generator):
+        walkers.y[index] += velocity
+
+    def batch_step(self, walkers, index, velocity, generator):
+        raise NotImplementedError
+
+
+@register_kernel
+class LatticeKernel(MovementKernel):
+    '''
+    Task A: left, right (1/4 each) or straight ahead (1/2) on the lattice
+    '''
+    name = "A"
+
+    def start(self, drunk):
+        drunk.position = (0, 0)
+
+    def step(self, drunk):
+        rand_value = drunk.rng.random() #that generates a random floating-point number between 0.0 (inclusive) and 1.0 (exclusive).
+        if rand_value < 0.25:
+            drunk.position = (drunk.position[0] - drunk.velocity, drunk.position[1]) # Move left; 如果if 沒滿足，則往elif跑，代表已知value為>= 0.25
+        elif rand_value < 0.5:
+            drunk.position = (drunk.position[0] + drunk.velocity, drunk.position[1]) # Move right; [0]為左右 [1]為上下
+        else:
+            drunk.position = (drunk.position[0], drunk.position[1] + drunk.velocity) # Move straight
+
+    def batch_step(self, walkers, index, velocity, generator):
+        u = generator.random(len(index))
+        walkers.x[index] += np.where(u < 0.25, -velocity, np.where(u < 0.5, velocity, 0))
+        walkers.y[index] += np.where(u >= 0.5, velocity, 0)
+
+
+@register_kernel
+class TurningKernel(MovementKernel):
+    '''
+    Task B: fixed step length, heading turned by one of TURNING_ANGLES
+    '''
+    name = "B"
+
+    def step(self, drunk):
+        drunk.new_direction = drunk.rng.choice(TURNING_ANGLES) #randomly pick the turning angle in radians
+        drunk.old_direction += drunk.new_direction #accumulate the turning angle to compute the movement in x-y coordinate system.
+        drunk.position = (drunk.position[0] + float(np.cos(drunk.old_direction))*drunk.velocity , drunk.position[1] + float(np.sin(drunk.old_direction))*drunk.velocity)
+
+    def batch_step(self, walkers, index, velocity, generator):
+        walkers.heading[index] += TURNING_ANGLES[generator.integers(len(TURNING_ANGLES), size=len(index))]
+        walkers.x[index] += np.cos(walkers.heading[index]) * velocity
+        walkers.y[index] += np.sin(walkers.heading[index]) * velocity
+
+
+@register_kernel
+class ExponentialTimeKernel(MovementKernel):
+    '''
+    Task C: exponential time steps and a uniform turn in [-2/3 pi, 2/3 pi]
+    '''
+    name = "C"
+
+    def first_step(self, drunk):
+        time_step = drunk.rng.expovariate(1)  # Intensity = 1/time unit
+        drunk.position = (drunk.position[0], drunk.position[1] + drunk.velocity * time_step)
+
+    def step(self, drunk):
+        # Exponential time step
+        time_step = drunk.rng.expovariate(1)  # Intensity = 1/time unit
+        drunk.time += time_step
+
+        # Angular adjustment α uniformly in [-2/3π, +2/3π]
+        alpha = drunk.rng.uniform(-2/3 * math.pi, 2/3 * math.pi)
+        drunk.old_direction += alpha
+
+        # Move based on velocity, time step, and new direction
+        dx = drunk.velocity * time_step * math.cos(drunk.old_direction)
+        dy = drunk.velocity * time_step * math.sin(drunk.old_direction)
+        drunk.position = (drunk.position[0] + dx, drunk.position[1] + dy)
+
+    def batch_first_step(self, walkers, index, velocity, generator):
+        walkers.y[index] += velocity * generator.exponential(1., len(index))
+
+    def batch_step(self, walkers, index, velocity, generator):
+        time_step = generator.exponential(1., len(index))
+        walkers.heading[index] += generator.uniform(-2/3 * np.pi, 2/3 * np.pi, len(index))
+        walkers.x[index] += velocity * time_step * np.cos(walkers.heading[index])
+        walkers.y[index] += velocity * time_step * np.sin(walkers.heading[index])
+        walkers.time[index] += time_step
+
+
+class CorrelatedKernel(MovementKernel):
+    '''
+    Correlated random walk: fixed step length, normally distributed turns
+    with standard deviation turning_sd (radians)
+    '''
+    def __init__(self, name="correlated", turning_sd=0.5):
+        self.name = name
+        self.turning_sd = turning_sd
+
+    def step(self, drunk):
+        drunk.old_direction += NormalDist(0., self.turning_sd).inv_cdf(min(max(drunk.rng.random(), 1e-12), 1 - 1e-12))
+        drunk.position = (drunk.position[0] + math.cos(drunk.old_direction) * drunk.velocity,
+                          drunk.position[1] + math.sin(drunk.old_direction) * drunk.velocity)
+
+    def batch_step(self, walkers, index, velocity, generator):
+        walkers.heading[index] += generator.normal(0., self.turning_sd, len(index))
+        walkers.x[index] += np.cos(walkers.heading[index]) * velocity
+        walkers.y[index] += np.sin(walkers.heading[index]) * velocity
+
+
+class LevyKernel(MovementKernel):
+    '''
+    Lévy flight: uniformly random direction and Pareto distributed step
+    lengths, velocity * U ** (-1 / alpha), heavy-tailed for alpha < 2
+    '''
+    def __init__(self, name="levy", alpha=1.5):
+        self.name = name
+        self.alpha = alpha
+
+    def step(self, drunk):
+        drunk.old_direction = drunk.rng.uniform(0., 2 * math.pi)
+        length = drunk.velocity * (1.0 - drunk.rng.random()) ** (-1 / self.alpha)
+        drunk.position = (drunk.position[0] + math.cos(drunk.old_direction) * length,
+                          drunk.position[1] + math.sin(drunk.old_direction) * length)
+
+    def batch_step(self, walkers, index, velocity, generator):
+        walkers.heading[index] = generator.uniform(0., 2 * np.pi, len(index))
+        length = velocity * (1.0 - generator.random(len(index))) ** (-1 / self.alpha)
+        walkers.x[index] += np.cos(walkers.heading[index]) * length
+        walkers.y[index] += np.sin(walkers.heading[index]) * length
+
+
+register_kernel(CorrelatedKernel())
+register_kernel(LevyKernel())
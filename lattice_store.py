@@ -0,0 +1,134 @@
+'''
+Compact storage of task A walks.
+
+A task A walk starts at (0, 0) and every step moves left, right or straight
+ahead by the walk speed, so it is completely described by its moves. Each
+move takes 2 bits, four to a byte, instead of a tuple of coordinates (about
+64 bytes in a list); with 8 bytes of index per walk that is some 50 times
+less memory for the short walks of the default street and over 200 times
+for long ones, enough to keep every walk of a large run. Walks are decoded
+back to positions with cumulative sums when somebody asks for one.
+'''
+import numpy as np
+
+LEFT, RIGHT, STRAIGHT = 0, 1, 2 # move codes
+SHIFTS = np.array([0, 2, 4, 6], dtype=np.uint8) # bit offset of the four moves in a byte
+
+
+def encode_moves(walk):
+    '''
+    Move codes of a lattice walk given as its positions
+    '''
+    steps = np.diff(np.asarray(walk, dtype=float).reshape(-1, 2), axis=0)
+    if np.any((steps[:, 0] != 0) == (steps[:, 1] != 0)) or np.any(steps[:, 1] < 0):
+        raise ValueError("not a task A walk: every step must go left, right or straight ahead")
+    return np.where(steps[:, 1] > 0, STRAIGHT, np.where(steps[:, 0] < 0, LEFT, RIGHT)).astype(np.uint8)
+
+
+def pack_moves(codes):
+    '''
+    Four 2-bit codes per byte, the first in the lowest bits
+    '''
+    padded = np.zeros(-(-len(codes) // 4) * 4, dtype=np.uint8)
+    padded[:len(codes)] = codes
+    return np.bitwise_or.reduce(padded.reshape(-1, 4) << SHIFTS, axis=1).astype(np.uint8)
+
+
+def unpack_moves(packed, start, n):
+    '''
+    n codes starting at move number start of a packed byte array
+    '''
+    first, last = start // 4, -(-(start + n) // 4)
+    codes = ((packed[first:last, None] >> SHIFTS) & 3).reshape(-1)
+    return codes[start - 4 * first:start - 4 * first + n]
+
+
+class LatticeWalkStore:
+    '''
+    Task A walks, 2 bits per move. Behaves like the list Scenario.walks:
+    append a walk (its positions), index it to get one back as an (n, 2)
+    array of positions, iterate or take its len.
+    '''
+    def __init__(self, velocity=2):
+        self.velocity = velocity
+        self.packed = np.zeros(64, dtype=np.uint8) # grows by doubling
+        self.moves = 0 # moves stored so far
+        self.ends = np.zeros(16, dtype=np.int64) # end of every walk's moves, grows by doubling
+        self.walks = 0
+
+    def append_moves(self, codes):
+        '''
+        Appends one walk given as move codes
+        '''
+        codes = np.asarray(codes, dtype=np.uint8)
+        end = self.moves + len(codes)
+        if -(-end // 4) > len(self.packed):
+            self.packed = np.concatenate((self.packed, np.zeros(max(len(self.packed), -(-end // 4) - len(self.packed)), dtype=np.uint8)))
+        # fill the partly used last byte first, then whole bytes
+        head = min((-self.moves) % 4, len(codes))
+        for k in range(head):
+            self.packed[(self.moves + k) // 4] |= codes[k] << SHIFTS[(self.moves + k) % 4]
+        if len(codes) > head:
+            first = (self.moves + head) // 4
+            body = pack_moves(codes[head:])
+            self.packed[first:first + len(body)] = body
+        if self.walks == len(self.ends):
+            self.ends = np.concatenate((self.ends, np.zeros(len(self.ends), dtype=np.int64)))
+        self.ends[self.walks] = end
+        self.walks += 1
+        self.moves = end
+
+    def append(self, walk):
+        self.append_moves(encode_moves(walk))
+
+    def extend(self, walks):
+        if isinstance(walks, LatticeWalkStore):
+            for i in range(len(walks)):
+                self.append_moves(walks.moves_of(i))
+            return
+        for walk in walks:
+            self.append(walk)
+
+    def __len__(self):
+        return self.walks
+
+    def moves_of(self, i):
+        start = self.ends[i - 1] if i > 0 else 0
+        return unpack_moves(self.packed, start, self.ends[i] - start)
+
+    def __getitem__(self, i):
+        '''
+        Positions of walk i as an (moves + 1, 2) array, starting at (0, 0)
+        '''
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("walk index out of range")
+        codes = self.moves_of(i)
+        positions = np.zeros((len(codes) + 1, 2))
+        positions[1:, 0] = np.cumsum(np.where(codes == LEFT, -self.velocity, np.where(codes == RIGHT, self.velocity, 0)))
+        positions[1:, 1] = np.cumsum(np.where(codes == STRAIGHT, self.velocity, 0))
+        return positions
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def nbytes(self):
+        '''
+        Memory used by the moves and the per-walk index
+        '''
+        return -(-self.moves // 4) + self.ends.itemsize * len(self)
+
+    def save(self, path):
+        np.savez(path, packed=self.packed[:-(-self.moves // 4)], ends=self.ends[:self.walks], velocity=self.velocity)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            store = cls(data["velocity"].item())
+            store.packed = np.concatenate((data["packed"], np.zeros(64, dtype=np.uint8)))
+            store.ends = np.concatenate((data["ends"], np.zeros(16, dtype=np.int64)))
+        store.walks = len(store.ends) - 16
+        store.moves = int(store.ends[store.walks - 1]) if store.walks else 0
+        return store
@@ -0,0 +1,118 @@
+'''
+Scenario runners shared by the command line, sharding.py and
+batch_runner.py: a scenario is cut into fixed-size chunks (chunk k seeded
+with seed + k), the chunks run in this process or on a process pool, and
+the results are merged into one summary.
+'''
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from sampling import replicate_interval
+from shared_arena import run_chunks_shared
+from simulation import OutcomeTally, Scenario, Street, WalkTable
+
+
+def run_chunk(task, attempts, seed, engine, record, hit_probability, sampling="pseudo"):
+    '''
+    Runs one chunk of walks in a fresh Scenario; this is what a worker process
+    executes. Returns the per-walk WalkTable, the recorded walks and, for QMC
+    or antithetic sampling, the replicate estimates of the survival and
+    success fractions.
+    '''
+    scenario = Scenario(attempts=attempts, task=task, seed=seed, engine=engine, record=record, sampling=sampling,
+                        street=hit_street(hit_probability))
+    scenario.run_codes()
+    estimates = None
+    if sampling != "pseudo":
+        estimates = {rate: scenario.replicate_estimates(rate) for rate in ("survival", "success")}
+    return scenario.table, scenario.return_walks(), estimates
+
+
+def run_exposure_chunk(task, attempts, seed, sampling="pseudo"):
+    '''
+    Runs one chunk of collision-free walks and returns their ExposureTable
+    '''
+    return Scenario(attempts=attempts, task=task, seed=seed, record="none", sampling=sampling).run_exposures()
+
+
+def split_attempts(attempts, chunk_size):
+    '''
+    Fixed-size chunks, so the results only depend on the seed and the chunk
+    size, never on the number of workers. Chunk k is seeded with seed + k.
+    '''
+    return [min(chunk_size, attempts - start) for start in range(0, attempts, chunk_size)]
+
+
+def hit_street(hit_probability=None):
+    '''
+    The default street, with its hit probability overridden when given
+    '''
+    street = Street()
+    if hit_probability is not None:
+        street.probability_of_hit_on_danger_zone = hit_probability
+    return street
+
+
+def resolve_engine(engine, task, attempts, street, record="none", sampling="pseudo", approximate=False):
+    '''
+    The engine a run of attempts walks per Scenario uses: engine itself or,
+    for "auto", the pick of autotune.py (among exact engines unless
+    approximate). Resolved once by the caller, so that every chunk runs (and
+    is reported with) the same engine.
+    '''
+    if engine != "auto":
+        return engine
+    from autotune import choose_engine
+
+    return choose_engine(task, attempts, street, record, sampling, approximate=approximate)[0]
+
+
+def run_scenario(task, attempts, seed=43, engine="reference", record="none", workers=1,
+                 chunk_size=10000, hit_probability=None, sampling="pseudo", approximate=False):
+    '''
+    Runs a scenario over one or more worker processes and summarizes it;
+    the summary names the engine that actually ran, also for "auto".
+    '''
+    chunks = split_attempts(attempts, chunk_size)
+    street = hit_street(hit_probability)
+    engine = resolve_engine(engine, task, chunks[0], street, record, sampling, approximate)
+    jobs = [(task, n, seed + k, engine, record, hit_probability, sampling) for k, n in enumerate(chunks)]
+    start = time.perf_counter()
+    if workers > 1 and len(jobs) > 1:
+        # workers write into shared memory; only the arena specs are pickled
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            table, walks, tallies, estimates = run_chunks_shared(pool, street, chunks, task, seed, engine, record, sampling)
+    else:
+        parts = [run_chunk(*job) for job in jobs]
+        table = WalkTable.concatenate([part[0] for part in parts])
+        walks = [walk for part in parts for walk in part[1]]
+        tallies = [part[0].tally() for part in parts]
+        estimates = [part[2] for part in parts]
+    elapsed = time.perf_counter() - start
+
+    tally = OutcomeTally()
+    for chunk_tally in tallies:
+        tally.merge(chunk_tally)
+    intervals = {rate: tally.confidence_interval(rate) for rate in ("survival", "success")}
+    if sampling != "pseudo":   # every chunk is an independent set of replicates
+        for rate in intervals:
+            means = np.concatenate([chunk[rate][0] for chunk in estimates])
+            sizes = np.concatenate([chunk[rate][1] for chunk in estimates])
+            intervals[rate] = replicate_interval(means, sizes)
+    summary = {
+        "task": task,
+        "attempts": attempts,
+        "seed": seed,
+        "engine": engine,
+        "sampling": sampling,
+        "hit_probability": hit_probability,
+        **tally.to_dict(),
+        "survival_rate": tally.survival_rate(),
+        "survival_interval": intervals["survival"],
+        "success_rate": tally.success_rate(),
+        "success_interval": intervals["success"],
+        "seconds": elapsed,
+    }
+    return summary, table, walks
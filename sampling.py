@@ -0,0 +1,164 @@
+'''
+Random-input streams for variance reduction.
+
+Drunk and Grid draw their randomness through an rng object with the
+interface of the random module (random, uniform, expovariate, choice). The
+streams here implement that interface on top of plain uniforms, so a walk can
+be driven by a point of a scrambled low-discrepancy sequence (randomized
+quasi-Monte Carlo) or by the mirrored uniforms of its antithetic partner.
+'''
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+SAMPLING_MODES = ("pseudo", "qmc", "antithetic")
+MASK64 = (1 << 64) - 1
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15 # SplitMix64 increment
+PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71, 73, 79, 83, 89, 97, 101,
+          103, 107, 109, 113, 127, 131, 137, 139, 149, 151, 157, 163, 167, 173, 179, 181, 191, 193, 197, 199)
+
+
+def scrambled_halton(n, dimensions, generator):
+    '''
+    First n points of the Halton sequence in [0, 1)^dimensions with random
+    digit permutation scrambling: every digit of every base gets its own
+    random permutation, drawn from the NumPy generator.
+    '''
+    if dimensions > len(PRIMES):
+        raise ValueError(f"at most {len(PRIMES)} quasi-random dimensions are supported")
+    points = np.empty((n, dimensions))
+    index = np.arange(n)
+    for j, base in enumerate(PRIMES[:dimensions]):
+        digits = int(math.ceil(53 / math.log2(base)))   # enough digits for double precision
+        k = index.copy()
+        u = np.zeros(n)
+        scale = 1 / base
+        for _ in range(digits):
+            u += generator.permutation(base)[k % base] * scale
+            k //= base
+            scale /= base
+        points[:, j] = u
+    return np.minimum(points, np.nextafter(1., 0.)) # rounding may reach 1.0
+
+
+class UniformStream:
+    '''
+    The part of the random module interface used by the simulation, built on
+    a single source of uniforms in [0, 1)
+    '''
+    def next_uniform(self):
+        raise NotImplementedError
+
+    def random(self):
+        return self.next_uniform()
+
+    def uniform(self, a, b):
+        return a + (b - a) * self.next_uniform()
+
+    def expovariate(self, lambd):
+        return -math.log(1.0 - self.next_uniform()) / lambd
+
+    def choice(self, seq):
+        return seq[min(int(self.next_uniform() * len(seq)), len(seq) - 1)]
+
+
+class QMCStream(UniformStream):
+    '''
+    Hands out the coordinates of one quasi-random point, then continues with
+    the pseudo-random fallback once the walk used them all
+    '''
+    def __init__(self, point, fallback):
+        self.point = point
+        self.used = 0
+        self.fallback = fallback
+
+    def next_uniform(self):
+        if self.used < len(self.point):
+            self.used += 1
+            return float(self.point[self.used - 1])
+        return self.fallback.random()
+
+
+class RecordingStream(UniformStream):
+    '''
+    Pseudo-random uniforms that are remembered for the antithetic partner
+    '''
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self.recorded = []
+
+    def next_uniform(self):
+        u = self.fallback.random()
+        self.recorded.append(u)
+        return u
+
+
+class MirrorStream(UniformStream):
+    '''
+    Replays 1 - u for the uniforms of a RecordingStream, then carries on with
+    fresh ones if this walk lasts longer than its partner
+    '''
+    def __init__(self, recorded, fallback):
+        self.recorded = recorded
+        self.used = 0
+        self.fallback = fallback
+
+    def next_uniform(self):
+        if self.used < len(self.recorded):
+            self.used += 1
+            return 1.0 - self.recorded[self.used - 1]
+        return self.fallback.random()
+
+
+def mix64(z):
+    '''
+    SplitMix64 finalizer: a bijective scrambling of a 64-bit integer
+    '''
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+class CounterStream(UniformStream):
+    '''
+    Counter-based generator: the j-th uniform of walk `index` is a pure
+    function of (seed, index, stream, j), so any walk of a run can be drawn
+    again without replaying the ones before it. This is SplitMix64 keyed by
+    a hash of (seed, index, stream).
+    '''
+    def __init__(self, seed, index, stream=0):
+        key = mix64((seed + GOLDEN_GAMMA) & MASK64)
+        key = mix64(((key ^ index) + GOLDEN_GAMMA) & MASK64)
+        self.key = mix64(((key ^ stream) + GOLDEN_GAMMA) & MASK64)
+        self.counter = 0
+
+    def next_uniform(self):
+        self.counter += 1
+        return (mix64((self.key + self.counter * GOLDEN_GAMMA) & MASK64) >> 11) * 2.0**-53
+
+
+def t_quantile(p, degrees_of_freedom):
+    '''
+    Student t quantile from the Cornish-Fisher expansion around the normal one
+    '''
+    z = NormalDist().inv_cdf(p)
+    v = degrees_of_freedom
+    return (z + (z**3 + z) / (4 * v) + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * v**2)
+            + (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * v**3))
+
+
+def replicate_interval(means, sizes, level=0.95):
+    '''
+    Confidence interval, in percent, from independent replicate estimates
+    (randomizations for QMC, antithetic pairs), weighted by replicate size
+    '''
+    means = np.asarray(means, dtype=float)
+    weights = np.asarray(sizes, dtype=float) / np.sum(sizes)
+    r = len(means)
+    estimate = float((weights * means).sum())
+    if r < 2:
+        return (estimate * 100, estimate * 100)
+    variance = float((weights * (means - estimate) ** 2).sum()) * r / (r - 1) / r
+    half_width = t_quantile(0.5 + level / 2, r - 1) * math.sqrt(variance)
+    return (max(estimate - half_width, 0.) * 100, min(estimate + half_width, 1.) * 100)
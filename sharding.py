@@ -0,0 +1,229 @@
+'''
+Sharded execution over several machines (or several processes on one).
+
+A Coordinator cuts a scenario, or every point of a sweep, into seed-range
+shards: the same fixed-size chunks runners.py runs, chunk k seeded with seed + k.
+Workers connect over TCP, take one shard at a time and answer with its
+OutcomeTally and summed walk statistics only. Shards of workers that drop the
+connection, or go silent (TCP keepalive, and a deadline per shard that grows
+with its number of walks), are handed out again. Results are merged in shard order, so they
+are identical to a single-process run with the same seed and chunk size.
+
+Messages are newline-delimited JSON objects.
+'''
+import json
+import queue
+import socket
+import threading
+
+from simulation import OutcomeTally
+from runners import hit_street, resolve_engine, run_chunk, split_attempts
+
+STAT_COLUMNS = ("steps", "time", "danger_exposure") # summed per shard, merged by addition
+
+
+def make_shards(points, attempts, seed=43, chunk_size=10000, engine="reference"):
+    '''
+    One shard per chunk of every (task, hit_probability) point; engine="auto"
+    is resolved here, once per point, so every worker runs the same engine
+    '''
+    shards = []
+    for point, (task, hit_probability) in enumerate(points):
+        chunks = split_attempts(attempts, chunk_size)
+        point_engine = resolve_engine(engine, task, chunks[0], hit_street(hit_probability))
+        for k, n in enumerate(chunks):
+            shards.append({"shard": len(shards), "point": point, "task": task, "hit_probability": hit_probability,
+                           "attempts": n, "seed": seed + k, "engine": point_engine})
+    return shards
+
+
+def run_shard(shard):
+    '''
+    Runs one shard and reduces it to its tally and summed statistics
+    '''
+    table = run_chunk(shard["task"], shard["attempts"], shard["seed"], shard["engine"], "none",
+                      shard["hit_probability"])[0]
+    stats = {}
+    for name in STAT_COLUMNS:
+        column = table[name].astype(float)
+        stats[name] = [float(column.sum()), float((column * column).sum())]
+    return {"type": "result", "shard": shard["shard"], "tally": table.tally().to_dict(), "stats": stats}
+
+
+def merge_results(points, attempts, seed, shards, results):
+    '''
+    Folds the shard results, in shard order, into one summary per point
+    '''
+    tallies = [OutcomeTally() for _ in points]
+    stats = [{name: [0., 0.] for name in STAT_COLUMNS} for _ in points]
+    engines = {shard["point"]: shard["engine"] for shard in shards}
+    for shard in shards:
+        result = results[shard["shard"]]
+        tallies[shard["point"]].merge(OutcomeTally.from_dict(result["tally"]))
+        for name, (total, squares) in result["stats"].items():
+            stats[shard["point"]][name][0] += total
+            stats[shard["point"]][name][1] += squares
+    summaries = []
+    for point, ((task, hit_probability), tally, sums) in enumerate(zip(points, tallies, stats)):
+        summary = {
+            "task": task,
+            "attempts": attempts,
+            "seed": seed,
+            "engine": engines[point],
+            "hit_probability": hit_probability,
+            **tally.to_dict(),
+            "survival_rate": tally.survival_rate(),
+            "survival_interval": tally.confidence_interval("survival"),
+            "success_rate": tally.success_rate(),
+            "success_interval": tally.confidence_interval("success"),
+        }
+        for name, (total, squares) in sums.items():
+            mean = total / tally.total
+            summary[f"mean_{name}"] = mean
+            summary[f"std_{name}"] = max(squares / tally.total - mean * mean, 0.) ** 0.5
+        summaries.append(summary)
+    return summaries
+
+
+def keep_alive(connection, idle=30, interval=10, count=3):
+    '''
+    TCP keepalive, so that a peer that lost power or got cut off shows up as
+    a connection error after idle + interval * count seconds
+    '''
+    connection.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for option, value in (("TCP_KEEPIDLE", idle), ("TCP_KEEPINTVL", interval), ("TCP_KEEPCNT", count)):
+        if hasattr(socket, option): # not on every platform; the system defaults apply there
+            connection.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+
+def send(stream, message):
+    stream.write((json.dumps(message) + "\n").encode())
+    stream.flush()
+
+
+class Coordinator:
+    '''
+    Hands out shards to connected workers and collects their results. A
+    worker that has not answered shard_timeout + walk_timeout * walks seconds
+    after getting a shard counts as dead (None: wait as long as it takes).
+    '''
+    def __init__(self, points, attempts, seed=43, chunk_size=10000, engine="reference", host="127.0.0.1", port=0,
+                 shard_timeout=60., walk_timeout=1e-3):
+        self.points = [tuple(point) for point in points]
+        self.shard_timeout = shard_timeout
+        self.walk_timeout = walk_timeout
+        self.attempts = attempts
+        self.seed = seed
+        self.engine = engine
+        self.shards = make_shards(self.points, attempts, seed, chunk_size, engine)
+        self.pending = queue.Queue()
+        for shard in self.shards:
+            self.pending.put(shard)
+        self.results = {}
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.server = socket.create_server((host, port))
+        self.address = self.server.getsockname()
+
+    def next_shard(self):
+        '''
+        Blocks until there is a shard to hand out; None once everything is done.
+        Waiting (rather than stopping) when the queue is empty matters: a shard
+        in flight elsewhere comes back if its worker dies.
+        '''
+        while not self.finished.is_set():
+            try:
+                shard = self.pending.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if shard["shard"] not in self.results:
+                return shard
+        return None
+
+    def serve_worker(self, connection):
+        shard = None
+        try:
+            with connection, connection.makefile("rwb") as stream:
+                for line in stream:
+                    message = json.loads(line)
+                    if message["type"] == "result":
+                        if shard is None or message.get("shard") != shard["shard"]:
+                            raise ValueError("result for a shard this worker was not given")
+                        with self.lock:
+                            self.results.setdefault(message["shard"], message)
+                            if len(self.results) == len(self.shards):
+                                self.finished.set()
+                    shard = self.next_shard()
+                    if shard is None:
+                        send(stream, {"type": "done"})
+                        return
+                    if self.shard_timeout is not None:
+                        connection.settimeout(self.shard_timeout + self.walk_timeout * shard["attempts"])
+                    send(stream, {"type": "shard", **shard})
+        except (OSError, ValueError):
+            pass # the worker died, went silent (timeouts are OSErrors) or misbehaved; its shard is re-queued below
+        finally:
+            if shard is not None and shard["shard"] not in self.results:
+                self.pending.put(shard)
+
+    def accept_workers(self):
+        self.server.settimeout(0.1)
+        while not self.finished.is_set():
+            try:
+                connection, _ = self.server.accept()
+            except socket.timeout:
+                continue
+            connection.settimeout(None)
+            keep_alive(connection)
+            threading.Thread(target=self.serve_worker, args=(connection,), daemon=True).start()
+
+    def run(self):
+        '''
+        Serves workers until every shard has a result, then returns one
+        summary per point
+        '''
+        acceptor = threading.Thread(target=self.accept_workers, daemon=True)
+        acceptor.start()
+        self.finished.wait()
+        acceptor.join()
+        self.server.close()
+        return merge_results(self.points, self.attempts, self.seed, self.shards, self.results)
+
+
+def run_worker(host, port):
+    '''
+    Connects to a coordinator and runs shards until told it is done
+    '''
+    with socket.create_connection((host, port)) as connection, connection.makefile("rwb") as stream:
+        send(stream, {"type": "ready"})
+        for line in stream:
+            message = json.loads(line)
+            if message["type"] == "done":
+                return
+            send(stream, run_shard(message))
+
+
+def run_local(points, attempts, seed=43, chunk_size=10000, engine="reference", workers=2):
+    '''
+    Coordinator plus worker processes on localhost
+    '''
+    import multiprocessing
+
+    coordinator = Coordinator(points, attempts, seed, chunk_size, engine)
+    processes = [multiprocessing.Process(target=run_worker, args=coordinator.address) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    summaries = coordinator.run()
+    for process in processes:
+        process.join()
+    return summaries
+
+
+def run_single_process(points, attempts, seed=43, chunk_size=10000, engine="reference"):
+    '''
+    The same shards, run one after the other in this process
+    '''
+    points = [tuple(point) for point in points]
+    shards = make_shards(points, attempts, seed, chunk_size, engine)
+    results = {shard["shard"]: run_shard(shard) for shard in shards}
+    return merge_results(points, attempts, seed, shards, results)
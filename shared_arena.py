@@ -0,0 +1,249 @@
+'''
+Shared-memory transport between worker processes.
+
+A SharedArena is one multiprocessing.shared_memory block holding a few named
+NumPy arrays back to back. Only its spec (block name and array layout) is
+pickled to the other process, which attaches and works on the very same
+memory. The parent creates the arenas for the per-walk table and the tallies;
+every worker writes its rows of the table and its tally row in place, so
+those never get copied.
+
+Two things are not zero-copy:
+  - the street goes over as its compiled tables (edges, danger mask, hit
+    probability), but the engines work on Street and Zone objects, so every
+    worker rebuilds a Street from them; they are a few dozen bytes,
+  - recorded walks are built by the engines as lists of position tuples
+    and copied once into an arena of the worker, whose spec goes back to the
+    parent. That is one copy in place of pickling them.
+Nothing the size of the results is pickled.
+'''
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from simulation import OUTCOMES, OutcomeTally, Scenario, Street, WalkTable, Zone
+
+ALIGNMENT = 64 # bytes; every array starts on a cache line
+
+
+class Mapping:
+    '''
+    Keeps a SharedMemory block mapped for as long as any array over it
+    lives. Arrays made from it have it at the end of their .base chain, so
+    the block is only closed (by SharedMemory.__del__) after the last one
+    is gone, whatever happens to the arena or the table wrapping them.
+    '''
+    def __init__(self, memory):
+        self.memory = memory
+        address = np.frombuffer(memory.buf, dtype=np.uint8).ctypes.data
+        self.__array_interface__ = {"shape": (memory.size,), "typestr": "|u1", "data": (address, False), "version": 3}
+
+
+class SharedArena:
+    '''
+    Named arrays in one shared memory block. layout is a list of
+    (name, dtype, shape); arrays maps the names to views into the block.
+    '''
+    def __init__(self, layout, name=None):
+        self.layout = [(array_name, np.dtype(dtype).str, tuple(shape)) for array_name, dtype, shape in layout]
+        offsets, size = [], 0
+        for _, dtype, shape in self.layout:
+            offsets.append(size)
+            size += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // ALIGNMENT) * ALIGNMENT
+        self.owner = name is None
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        block = np.asarray(Mapping(self.memory))
+        self.arrays = {}
+        for (array_name, dtype, shape), offset in zip(self.layout, offsets):
+            nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            self.arrays[array_name] = block[offset:offset + nbytes].view(dtype).reshape(shape)
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(spec["layout"], spec["name"])
+
+    def spec(self):
+        '''
+        What another process needs to attach: picklable and tiny
+        '''
+        return {"name": self.memory.name, "layout": self.layout}
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def close(self):
+        '''
+        Lets go of this arena's views; the block is unmapped once no other
+        array over it is left
+        '''
+        self.arrays = {}
+        self.memory = None
+
+    def unlink(self):
+        '''
+        Removes the block's name. The memory itself lives on until every
+        process closed it, so the views of this process stay valid.
+        '''
+        self.memory.unlink()
+
+
+def table_arena(n):
+    '''
+    Arena for the WalkTable columns of n walks
+    '''
+    return SharedArena([(name, dtype, (n,)) for name, dtype in WalkTable.COLUMNS.items()])
+
+
+def tally_arena(chunks):
+    '''
+    Arena for one row of outcome counts per chunk
+    '''
+    return SharedArena([("counts", np.int64, (chunks, len(OUTCOMES)))])
+
+
+def street_arena(street):
+    '''
+    The compiled tables of a Street: zone edges, danger mask and hit
+    probability; workers turn them back into a Street (street_from_arena)
+    '''
+    edges = street.get_zone_edges()
+    arena = SharedArena([("edges", np.float64, edges.shape), ("danger", np.bool_, (len(street.zones),)),
+                         ("hit_probability", np.float64, ())])
+    arena["edges"][:] = edges
+    arena["danger"][:] = street.get_danger_mask()
+    arena["hit_probability"][()] = street.probability_of_hit_on_danger_zone
+    return arena
+
+
+def street_from_arena(arena):
+    '''
+    Rebuilds the Street a street_arena was made from, for the engines
+    that only take Street objects
+    '''
+    street = Street()
+    lengths = np.diff(arena["edges"])
+    street.zones = [Zone("dangerous" if danger else "safe", float(length))
+                    for length, danger in zip(lengths, arena["danger"])]
+    street.probability_of_hit_on_danger_zone = float(arena["hit_probability"])
+    return street
+
+
+class PackedWalks:
+    '''
+    Recorded walks as one (points, 2) position array plus the number of
+    points of every walk, the layout write_results stores. Indexing gives a
+    walk as a view into positions, so it works on shared memory unchanged.
+    '''
+    def __init__(self, positions, lengths):
+        self.positions = positions
+        self.lengths = lengths
+        self.starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+
+    @classmethod
+    def from_walks(cls, walks):
+        return cls(np.array([position for walk in walks for position in walk], dtype=float).reshape(-1, 2),
+                   np.array([len(walk) for walk in walks], dtype=np.int64))
+
+    @classmethod
+    def concatenate(cls, parts):
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return cls(np.empty((0, 2)), np.empty(0, dtype=np.int64))
+        if len(parts) == 1:
+            return parts[0]
+        return cls(np.concatenate([part.positions for part in parts]), np.concatenate([part.lengths for part in parts]))
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, i):
+        return self.positions[self.starts[i]:self.starts[i] + self.lengths[i]]
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+def walks_arena(walks):
+    '''
+    Copies recorded walks (lists of position tuples) into a fresh arena; its
+    spec goes back to the parent
+    '''
+    lengths = np.array([len(walk) for walk in walks], dtype=np.int64)
+    arena = SharedArena([("positions", np.float64, (int(lengths.sum()), 2)), ("lengths", np.int64, lengths.shape)])
+    arena["lengths"][:] = lengths
+    row = 0
+    for walk in walks:
+        arena["positions"][row:row + len(walk)] = walk
+        row += len(walk)
+    return arena
+
+
+def run_chunk_shared(table_spec, tally_spec, street_spec, chunk, start, task, attempts, seed, engine, record, sampling="pseudo"):
+    '''
+    Worker side of run_chunk over shared memory: runs one chunk on a Street
+    rebuilt from the shared street tables, straight into rows
+    start:start + attempts of the shared table, and writes row chunk of the
+    tallies. Returns the spec of an arena the recorded walks were copied to
+    (None when nothing was recorded) and the replicate estimates, which are
+    small.
+    '''
+    street = SharedArena.attach(street_spec)
+    table = SharedArena.attach(table_spec)
+    tallies = SharedArena.attach(tally_spec)
+    try:
+        scenario = Scenario(attempts=attempts, task=task, seed=seed, engine=engine, record=record, sampling=sampling,
+                            street=street_from_arena(street))
+        scenario.output = WalkTable({name: table[name][start:start + attempts] for name in WalkTable.COLUMNS})
+        scenario.run_codes()
+        tally = scenario.table.tally()
+        tallies["counts"][chunk] = [tally.success, tally.stay, tally.crash]
+        estimates = None
+        if sampling != "pseudo":
+            estimates = {rate: scenario.replicate_estimates(rate) for rate in ("survival", "success")}
+        walks = scenario.return_walks()
+        scenario.output = scenario.table = None # let go of the views before unmapping
+    finally:
+        for arena in (street, table, tallies):
+            arena.close()
+    if not walks:
+        return None, estimates
+    arena = walks_arena(walks)
+    spec = arena.spec()
+    arena.close()
+    return spec, estimates
+
+
+def run_chunks_shared(pool, street, chunks, task, seed, engine, record, sampling="pseudo"):
+    '''
+    Parent side: runs the chunks on a process pool and maps everything the
+    workers wrote. Returns the WalkTable and PackedWalks (over shared memory
+    that stays mapped while any of their arrays lives), one OutcomeTally per
+    chunk and the replicate estimates.
+    The walks of several chunks are joined with one array copy. Every block
+    is unlinked once mapped, so nothing outlives the process.
+    '''
+    starts = np.concatenate(([0], np.cumsum(chunks)[:-1]))
+    table, tallies, shared_street = table_arena(sum(chunks)), tally_arena(len(chunks)), street_arena(street)
+    try:
+        jobs = [(table.spec(), tallies.spec(), shared_street.spec(), k, int(start), task, n, seed + k, engine, record, sampling)
+                for k, (start, n) in enumerate(zip(starts, chunks))]
+        results = list(pool.map(run_chunk_shared, *zip(*jobs)))
+    finally:
+        for arena in (table, tallies, shared_street):
+            arena.unlink()
+    shared_street.close()
+    parts = []
+    for spec, _ in results:
+        if spec is None:
+            continue
+        arena = SharedArena.attach(spec)
+        arena.unlink()
+        walks = PackedWalks(arena["positions"], arena["lengths"])
+        parts.append(walks)
+    chunk_tallies = [OutcomeTally(*row) for row in tallies["counts"].tolist()]
+    tallies.close()
+    shared_table = WalkTable(dict(table.arrays))
+    return shared_table, PackedWalks.concatenate(parts), chunk_tallies, [result[1] for result in results]
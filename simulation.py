@@ -0,0 +1,764 @@
+'''
+Simulation core: the drunk, the street, their interactions and the scenario
+runner. Deliberately free of matplotlib so that worker processes and batch
+jobs start fast; plotting lives in visualization.py.
+'''
+import random
+import numpy as np
+import math
+from concurrent.futures import ThreadPoolExecutor
+from statistics import NormalDist
+
+from exposure import ExposureTable
+from kernels import get_kernel
+from lattice_store import LatticeWalkStore
+from sampling import (SAMPLING_MODES, CounterStream, QMCStream, RecordingStream, MirrorStream, scrambled_halton,
+                      replicate_interval)
+
+
+class Drunk:
+    '''
+    This represents a drunk person who includes an own time measure, a distance
+    measure, and may be made to behave differently depending on the task.
+    How he moves is delegated to the movement kernel of the task (kernels.py).
+    '''
+    def __init__(self, task, rng=random, kernel=None): #__init__(self) : This is the constructor method in Python, which is called when an instance of the class is created.
+        self.rng = rng # Source of the random inputs: the random module or a stream from sampling.py
+        self.time = 0  # Start time
+        self.velocity = 2 # Walk speed
+        self.task = task
+        self.kernel = kernel or get_kernel(task) # Resolved once per Scenario and passed in
+        self.kernel.start(self)
+
+    def first_step(self):
+        self.kernel.first_step(self)
+
+    def move(self):
+        self.kernel.step(self)
+        self.time += 1  # Increment time
+
+
+    
+    def get_vertical_position(self):
+        '''
+        Convenient function useful to determine whether the drunk is at the 
+        danger area or not
+        '''
+        return self.position[1]
+
+    
+
+class Zone:
+    '''
+    Just a helper structure class that's used in the class Street.
+    '''
+    def __init__(self, zone_type, length):
+        self.zone_type = zone_type  # 'safe' or 'dangerous'
+        self.length = length  # Length of the zone in meters
+
+class Street:
+    '''
+    Models the street, defining the safe and dangerous areas, as well as the
+    likelihood to be hit by a car at each of the time steps
+    '''
+    def __init__(self): #initializes the object's attributes / Automatically called when you create an object of the class.
+                        #Always take self as the first parameter to refer to the instance itself.
+        self.zones = [
+            Zone('safe', 1),
+            Zone('dangerous', 2),
+            Zone('safe', 2),
+            Zone('dangerous', 2),
+            Zone('safe', 1)
+        ]
+        self.probability_of_hit_on_danger_zone = 0.05
+
+    def get_street_size(self):
+        '''
+        Total street size 
+        '''
+        return sum([zone.length for zone in self.zones])
+
+    def get_zone_edges(self):
+        '''
+        Boundaries of the zones as an array: zone i spans [edges[i], edges[i + 1])
+        '''
+        return np.concatenate(([0.], np.cumsum([zone.length for zone in self.zones], dtype=float)))
+
+    def get_danger_mask(self):
+        '''
+        Boolean array telling which zones are dangerous
+        '''
+        return np.array([zone.zone_type == 'dangerous' for zone in self.zones])
+
+    def get_zone_indices(self, positions):
+        '''
+        Vectorized get_zone_index_at_position: zone index per position, -1 off the street
+        '''
+        edges = self.get_zone_edges()
+        indices = np.searchsorted(edges, positions, side='right') - 1
+        return np.where((indices >= 0) & (indices < len(self.zones)), indices, -1)
+
+    def get_zone_at_position(self, position):
+        '''
+        Are we at a safe zone of the street or not?
+        '''
+        index = self.get_zone_index_at_position(position)
+        if index is None:
+            return None  # Position is out of bounds
+        return self.zones[index].zone_type
+
+    def get_zone_index_at_position(self, position):
+        '''
+        Index into self.zones of the zone at the given position, None when off the street
+        '''
+        current_position = 0
+        for index, zone in enumerate(self.zones):
+            if current_position <= position < current_position + zone.length:
+                return index
+            current_position += zone.length    #如果position 不在第一個zone type，則跳到第二個zone ye 進行判別
+        return None  # Position is out of bounds
+
+    
+  
+class Grid:
+    '''
+    Includes interactions betewen the drunk and the street
+    '''
+    def __init__(self, drunk, street, rng=random, collisions=True):
+        self.drunk = drunk
+        self.street = street
+        self.rng = rng
+        self.collisions = collisions # False: nobody gets hit, exposure is only counted
+        self.zone_index = None # Zone of the last collision check
+        self.danger_exposure = 0 # Number of steps spent in dangerous zones
+        self.zone_exposure = [0] * len(street.zones) # The same, per zone
+    
+    def check_collision(self):
+        '''
+        Was there a collision between the drunk and a car on the street?
+        '''
+        self.zone_index = self.street.get_zone_index_at_position(self.drunk.get_vertical_position())
+        if self.zone_index is not None and self.street.zones[self.zone_index].zone_type == "dangerous":
+            self.danger_exposure += 1
+            self.zone_exposure[self.zone_index] += 1
+            if not self.collisions:
+                return False
+            hit_chance = self.rng.random() #generate a value between [0, 1)
+            if hit_chance < self.street.probability_of_hit_on_danger_zone:
+                return True  # Collision occurs
+        return False  # No collision
+    
+    def reached_sidewalk(self):
+        '''
+        Did we reach the other side? If so, the drunk survived.
+        '''
+        if self.drunk.get_vertical_position() >= self.street.get_street_size():
+            return True
+        return False
+
+    def turn_back_to_the_origin_side(self):
+        '''
+        Did the guy back to the origin side? If so, the drunk survived but counldn't get back to home
+        '''
+        if self.drunk.get_vertical_position() < 0:
+            return True
+    
+    
+    def finished_game(self):
+        '''
+        Checks if any of the above cases were covered, compactly
+        '''
+        if self.check_collision():
+            return "crash"
+        elif self.reached_sidewalk():
+            return "success"
+        elif self.turn_back_to_the_origin_side():
+            return "stay"
+
+        
+OUTCOMES = ("success", "stay", "crash")   # Outcome names, indexed by their code
+OUTCOME_CODES = {outcome: code for code, outcome in enumerate(OUTCOMES)}
+
+
+def encode_outcomes(results):
+    '''
+    Turns a list of outcome strings into a compact uint8 array of outcome codes.
+    Arrays that are already coded are returned as they are.
+    '''
+    if isinstance(results, np.ndarray) and results.dtype.kind in "iu":
+        return results.astype(np.uint8, copy=False)
+    return np.fromiter((OUTCOME_CODES[result] for result in results), dtype=np.uint8, count=len(results))
+
+
+class OutcomeTally:
+    '''
+    Success/stay/crash counts of a number of walks. Tallies of different chunks,
+    workers or resumed runs are merged by adding them up.
+    '''
+    def __init__(self, success=0, stay=0, crash=0):
+        self.success = int(success)
+        self.stay = int(stay)
+        self.crash = int(crash)
+
+    @classmethod
+    def from_codes(cls, codes):
+        return cls(*np.bincount(encode_outcomes(codes), minlength=len(OUTCOMES))[:len(OUTCOMES)])
+
+    @classmethod
+    def from_dict(cls, counts):
+        return cls(counts.get("success", 0), counts.get("stay", 0), counts.get("crash", 0))
+
+    def to_dict(self):
+        return {"success": self.success, "stay": self.stay, "crash": self.crash}
+
+    def merge(self, other):
+        '''
+        Adds the counts of another tally to this one, in place.
+        '''
+        self.success += other.success
+        self.stay += other.stay
+        self.crash += other.crash
+        return self
+
+    def __add__(self, other):
+        return OutcomeTally(self.success, self.stay, self.crash).merge(other)
+
+    def __eq__(self, other):
+        return isinstance(other, OutcomeTally) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"OutcomeTally(success={self.success}, stay={self.stay}, crash={self.crash})"
+
+    @property
+    def total(self):
+        return self.success + self.stay + self.crash
+
+    def survival_rate(self):
+        '''
+        Percentage of walks that did not end in a crash.
+        '''
+        return (self.success + self.stay) / self.total * 100
+
+    def success_rate(self):
+        '''
+        Percentage of walks that reached the other side.
+        '''
+        return self.success / self.total * 100
+
+    def confidence_interval(self, rate="survival", level=0.95):
+        '''
+        Wilson score interval, in percent, for the survival or success rate.
+        '''
+        hits = self.success + self.stay if rate == "survival" else self.success
+        n = self.total
+        z = NormalDist().inv_cdf(0.5 + level / 2)
+        p = hits / n
+        centre = (p + z**2 / (2 * n)) / (1 + z**2 / n)
+        half_width = z / (1 + z**2 / n) * math.sqrt(p * (1 - p) / n + z**2 / (4 * n**2))
+        return (max(centre - half_width, 0.) * 100, min(centre + half_width, 1.) * 100)
+
+
+class WalkTable:
+    '''
+    Columnar per-walk results: one NumPy array per column, one row per walk.
+    crash_zone is the index into Street.zones of the crash (-1 without crash)
+    and danger_exposure the number of steps that ended in a dangerous zone.
+    '''
+    COLUMNS = {
+        "outcome": np.uint8,
+        "steps": np.int32,
+        "time": np.float64,
+        "final_x": np.float64,
+        "final_y": np.float64,
+        "crash_zone": np.int16,
+        "danger_exposure": np.int32,
+    }
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    @classmethod
+    def empty(cls, n):
+        return cls({name: np.zeros(n, dtype=dtype) for name, dtype in cls.COLUMNS.items()})
+
+    @classmethod
+    def concatenate(cls, tables):
+        return cls({name: np.concatenate([table.columns[name] for table in tables]) for name in cls.COLUMNS})
+
+    def __len__(self):
+        return len(self.columns["outcome"])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def record(self, row, code, steps, drunk, grid):
+        '''
+        Fills in the row of a finished walk
+        '''
+        columns = self.columns
+        columns["outcome"][row] = code
+        columns["steps"][row] = steps
+        columns["time"][row] = drunk.time
+        columns["final_x"][row], columns["final_y"][row] = drunk.position
+        columns["crash_zone"][row] = grid.zone_index if code == OUTCOME_CODES["crash"] else -1
+        columns["danger_exposure"][row] = grid.danger_exposure
+
+    def filter(self, mask):
+        '''
+        Rows selected by a boolean mask (or an index array), as a new table
+        '''
+        return WalkTable({name: column[mask] for name, column in self.columns.items()})
+
+    def tally(self):
+        return OutcomeTally.from_codes(self.columns["outcome"])
+
+    def save(self, path):
+        '''
+        Writes an uncompressed .npz, so that load_walk_table can memory-map it
+        '''
+        np.savez(path, **self.columns)
+
+
+def load_walk_table(path, mmap=True):
+    '''
+    Loads a WalkTable saved with WalkTable.save. With mmap the columns are
+    read-only memory maps into the .npz file instead of in-memory copies.
+    '''
+    if not mmap:
+        with np.load(path) as data:
+            return WalkTable({name: data[name] for name in data.files})
+    import zipfile
+    import struct
+    columns = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path} is compressed and can't be memory-mapped")
+            f.seek(info.header_offset)
+            local_header = f.read(30)   # fixed part of the zip local file header
+            name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(f)
+            columns[info.filename[:-len(".npy")]] = np.memmap(path, dtype=dtype, mode="r", offset=f.tell(),
+                                                              shape=shape, order="F" if fortran_order else "C")
+    return WalkTable(columns)
+
+
+ENGINES = ("reference", "fast_a", "jump", "vectorized")   # Ways of running the walks, selectable per Scenario
+ENGINE_CHOICES = ENGINES + ("auto",) # "auto" picks one of ENGINES from calibrated costs (see autotune.py)
+RECORD_POLICIES = ("all", "crash", "none") # Which walks are kept in Scenario.walks
+
+
+class Scenario:
+    def __init__(self, attempts, task, seed=43, engine="reference", record="all", sampling="pseudo", replicates=16,
+                 qmc_dimensions=32, replayable=False, rng=None, street=None, first_walk=0, pack_walks=False,
+                 index_walks=False, approximate=False):
+        if engine not in ENGINE_CHOICES:
+            raise ValueError(f"Invalid engine {engine!r}, expected one of {ENGINE_CHOICES}")
+        if record not in RECORD_POLICIES:
+            raise ValueError(f"Invalid record policy {record!r}, expected one of {RECORD_POLICIES}")
+        if sampling not in SAMPLING_MODES:
+            raise ValueError(f"Invalid sampling mode {sampling!r}, expected one of {SAMPLING_MODES}")
+        if engine == "fast_a" and (task != "A" or record != "none" or replayable):
+            raise ValueError("the fast_a engine only runs task A without recording or replaying walks")
+        if engine == "jump" and task not in ("B", "C"):
+            raise ValueError("the jump engine only runs tasks B and C")
+        if engine == "vectorized" and (record != "none" or sampling != "pseudo" or replayable):
+            raise ValueError("the vectorized engine only runs pseudo-random walks without recording them")
+        if pack_walks and task != "A":
+            raise ValueError("only task A walks can be packed")
+        self.task = task
+        self.kernel = get_kernel(task) # Movement kernel, resolved once
+        self.street = street or Street()
+        self.engine_estimates = None # Estimated seconds per candidate engine when engine="auto"
+        if engine == "auto":
+            from autotune import choose_engine
+            engine, self.engine_estimates = choose_engine(task, attempts, self.street, record, sampling, replayable,
+                                                          approximate) # the jump engine only when approximate
+        self.attempts = attempts
+        self.seed = seed # A seed for reproducability.
+        self.engine = engine
+        self.record = record
+        self.sampling = sampling # "pseudo", randomized quasi-Monte Carlo "qmc" or "antithetic" pairs
+        self.replicates = min(replicates, attempts) # Independent QMC randomizations
+        self.qmc_dimensions = qmc_dimensions # Random inputs per walk taken from the QMC point
+        self.replayable = replayable # Walk i draws from CounterStreams keyed by (seed, i) and can be replayed
+        self.first_walk = first_walk # Index of walk 0 within a larger run split over threads
+        self.pack_walks = pack_walks # Keep task A walks 2 bits per move in a LatticeWalkStore
+        self.walks = LatticeWalkStore(Drunk(task).velocity) if pack_walks else []
+        self.recorded = [] # Indices of the recorded walks, kept instead of the walks when replayable
+        self.index_walks = index_walks # Compute the query features of every recorded walk (see walk_index.py)
+        self.features = None
+        if index_walks:
+            from walk_index import WalkFeatures
+            self.features = WalkFeatures(self.street.get_zone_edges())
+        self.table = None # WalkTable of the last run
+        self.output = None # WalkTable the next run writes into instead of a new one, e.g. rows of a shared-memory table
+        self.walk_index = 0 # Index of the next walk
+        self.qmc_block = None # (replicate, points) of the current QMC replicate
+        self.partners = None # (index, streams) of the last even walk of an antithetic pair
+        self.rng = rng or random.Random(self.seed) # Own generator, so scenarios in other threads don't interfere
+
+    def new_table(self):
+        '''
+        Table for the next run: self.output when given (its columns are written
+        in place and must be zeroed), else a new one
+        '''
+        if self.output is not None:
+            if len(self.output) != self.attempts:
+                raise ValueError(f"output table has {len(self.output)} rows for {self.attempts} attempts")
+            return self.output
+        return WalkTable.empty(self.attempts)
+
+    def replicate_starts(self):
+        '''
+        First walk index of each independent replicate, plus the end
+        '''
+        if self.sampling == "qmc":
+            return [-(-r * self.attempts // self.replicates) for r in range(self.replicates + 1)]
+        step = 2 if self.sampling == "antithetic" else 1
+        return list(range(0, self.attempts, step)) + [self.attempts]
+
+    def base_streams(self, i):
+        '''
+        Plain pseudo-random sources of walk i: the scenario's generator, or
+        counter-based streams of their own when the run is replayable
+        '''
+        if self.replayable:
+            return CounterStream(self.seed, self.first_walk + i, 0), CounterStream(self.seed, self.first_walk + i, 1)
+        return self.rng, self.rng
+
+    def walk_streams(self, i):
+        '''
+        Sources of the random inputs of walk i, according to self.sampling:
+        one for the movement of the drunk and one for the collision draws, so
+        that every coordinate of a QMC point or antithetic pair keeps one role
+        '''
+        base = self.base_streams(i)
+        if self.sampling == "pseudo" or i >= self.attempts:
+            return base
+        if self.sampling == "antithetic":
+            if i % 2 == 0:
+                self.partners = (i, tuple(RecordingStream(stream) for stream in base))
+                return self.partners[1]
+            if self.partners is None or self.partners[0] != i - 1:  # replaying: draw the partner again
+                self.play_walk(*self.walk_streams(i - 1))
+            return tuple(MirrorStream(partner.recorded, stream) for partner, stream in zip(self.partners[1], base))
+        replicate = i * self.replicates // self.attempts
+        starts = self.replicate_starts()
+        if self.qmc_block is None or self.qmc_block[0] != replicate:
+            n = starts[replicate + 1] - starts[replicate]
+            generator = np.random.default_rng((self.seed, replicate))
+            self.qmc_block = (replicate, scrambled_halton(n, self.qmc_dimensions, generator))
+        point = self.qmc_block[1][i - starts[replicate]]
+        half = self.qmc_dimensions // 2
+        return QMCStream(point[:half], base[0]), QMCStream(point[half:], base[1])
+
+    def play_walk(self, movement, collisions, hits=True):
+        '''
+        Plays one walk with the given random sources, returns the reason it
+        ended and its positions. Without hits nobody crashes.
+        '''
+        self.drunk = Drunk(task=self.task, rng=movement, kernel=self.kernel) # Create a new drunk player every "single_game" to reinitialize him to position (0, 0)
+        self.grid = Grid(self.drunk, self.street, rng=collisions, collisions=hits) # Create a grid in which the player interacts with the street and its danger zone
+        walk = [] #initialize and take walk
+        walk.append(self.drunk.position)
+        self.drunk.first_step()
+        walk.append(self.drunk.position) #first step strait toward the opposite side
+        while True:
+            self.drunk.move()
+            walk.append(self.drunk.position) # save position
+            reason = self.grid.finished_game()
+            if reason:
+                break
+        return reason, walk
+        
+    def play_walk_jump(self, movement, collisions):
+        '''
+        play_walk for tasks B and C that, deep inside a safe zone, jumps to the
+        point where the drunk first gets h closer to one of its borders, with a
+        sample from the first-exit table of jump.py. Also returns the number of
+        steps, since the walk no longer holds every step.
+        '''
+        from jump import get_exit_table
+
+        self.drunk = Drunk(task=self.task, rng=movement, kernel=self.kernel)
+        self.grid = Grid(self.drunk, self.street, rng=collisions)
+        exits = get_exit_table(self.task, self.drunk.velocity)
+        edges = self.street.get_zone_edges()
+        walk = [self.drunk.position]
+        self.drunk.first_step()
+        walk.append(self.drunk.position)
+        steps = 1
+        while True:
+            x, y = self.drunk.position
+            zone = self.street.get_zone_index_at_position(y)
+            level = None
+            if zone is not None and self.street.zones[zone].zone_type == "safe":
+                level = exits.level_for(min(y - edges[zone], edges[zone + 1] - y))
+            if level is None:
+                self.drunk.move()
+                steps += 1
+            else:
+                dx, dy, turn, n, time = exits.sample(level, self.drunk.old_direction, movement.random())
+                self.drunk.position = (x + dx, y + dy)
+                self.drunk.old_direction += turn
+                self.drunk.time += time
+                steps += n
+            walk.append(self.drunk.position)
+            reason = self.grid.finished_game()
+            if reason:
+                break
+        return reason, walk, steps
+
+    def run_single_game(self):
+        if self.engine == "jump":
+            reason, walk, self.steps = self.play_walk_jump(*self.walk_streams(self.walk_index))
+        else:
+            reason, walk = self.play_walk(*self.walk_streams(self.walk_index))
+            self.steps = len(walk) - 1
+        if self.record == "all" or (self.record == "crash" and reason == "crash"):
+            if self.features is not None:
+                self.features.append(walk, OUTCOME_CODES[reason], self.first_walk + self.walk_index, self.steps)
+            if self.replayable:
+                self.recorded.append(self.walk_index)
+            else:
+                self.walks.append(walk)
+        self.walk_index += 1
+        
+        return reason
+
+    def replay(self, i):
+        '''
+        Regenerates the full trajectory of walk i of a replayable run
+        '''
+        if not self.replayable:
+            raise ValueError("only walks of a Scenario(replayable=True) can be replayed")
+        drunk, grid = getattr(self, "drunk", None), getattr(self, "grid", None)
+        if self.engine == "jump":
+            _, walk, _ = self.play_walk_jump(*self.walk_streams(i))
+        else:
+            _, walk = self.play_walk(*self.walk_streams(i))
+        self.drunk, self.grid = drunk, grid
+        return walk
+    
+    def run_codes(self, threads=1):
+        '''
+        Runs the function run_single_game, self.attempts times, and returns the
+        outcomes as a uint8 array of codes (see OUTCOMES). The per-walk summaries
+        end up in self.table. With threads > 1 the walks are split over a
+        thread pool (see run_codes_threaded).
+        '''
+        if threads > 1:
+            return self.run_codes_threaded(threads)
+        if self.engine == "fast_a":
+            return self.run_codes_fast_a()
+        if self.engine == "vectorized":
+            return self.run_codes_vectorized()
+        self.table = self.new_table()
+        for attempt in range(self.attempts):
+            code = OUTCOME_CODES[self.run_single_game()]
+            self.table.record(attempt, code, self.steps, self.drunk, self.grid)
+        return self.table["outcome"]
+
+    def run_codes_fast_a(self):
+        '''
+        Outcome-only task A engine. Sideways moves never change how a walk
+        ends, so the number of them before each forward move is drawn at once
+        (geometric with parameter 1/2), together with the first hit among their
+        collision checks when standing in a dangerous zone. Steps, time and
+        exposure follow exactly the reference distribution; x is only drawn at
+        the end, from the total number of sideways moves.
+        '''
+        velocity = Drunk("A").velocity
+        size = self.street.get_street_size()
+        p = self.street.probability_of_hit_on_danger_zone
+        levels = int(math.ceil(size / velocity)) # y = k * velocity is on the street for k < levels
+        zone_at_level = [self.street.get_zone_index_at_position(k * velocity) for k in range(levels)]
+        danger_at_level = [zone is not None and self.street.zones[zone].zone_type == "dangerous" for zone in zone_at_level]
+        log_half = math.log(0.5)
+        log_miss = math.log(1 - p) if 0 < p < 1 else None
+        crash, success = OUTCOME_CODES["crash"], OUTCOME_CODES["success"]
+
+        self.table = self.new_table()
+        columns = self.table.columns
+        lateral_moves = np.zeros(self.attempts, dtype=np.int64)
+        for attempt in range(self.attempts):
+            movement, collisions = self.walk_streams(attempt)
+            level, time, lateral, exposure, code = min(1, levels), 0, 0, 0, success   # after the first step
+            while level < levels:
+                sideways = int(math.log(1.0 - movement.random()) / log_half) # moves before the next forward one
+                if danger_at_level[level] and p > 0:
+                    first_hit = 1 if log_miss is None else int(math.log(1.0 - collisions.random()) / log_miss) + 1
+                    if first_hit <= sideways:
+                        time, lateral, exposure, code = time + first_hit, lateral + first_hit, exposure + first_hit, crash
+                        break
+                    exposure += sideways
+                elif danger_at_level[level]:
+                    exposure += sideways
+                time += sideways + 1
+                lateral += sideways
+                level += 1
+                if level < levels and danger_at_level[level]:
+                    exposure += 1
+                    if collisions.random() < p:
+                        code = crash
+                        break
+            columns["outcome"][attempt] = code
+            columns["steps"][attempt] = time + 1
+            columns["time"][attempt] = time
+            columns["final_y"][attempt] = level * velocity
+            columns["crash_zone"][attempt] = zone_at_level[level] if code == crash else -1
+            columns["danger_exposure"][attempt] = exposure
+            lateral_moves[attempt] = lateral
+        # x is a sum of +-velocity over the sideways moves
+        right = np.random.default_rng((self.seed, 1)).binomial(lateral_moves, 0.5)
+        columns["final_x"][:] = velocity * (2 * right - lateral_moves)
+        self.walk_index = self.attempts
+        return columns["outcome"]
+
+    def run_codes_vectorized(self, batch_size=100000):
+        '''
+        Runs the walks as arrays with the batch step of the movement kernel,
+        see vectorized.py
+        '''
+        from vectorized import run_vectorized
+
+        return run_vectorized(self, batch_size)
+
+    def run_codes_threaded(self, threads):
+        '''
+        Splits the walks into one child Scenario per thread and runs them on a
+        thread pool; this only runs in parallel on free-threaded CPython. Child k
+        of a replayable run continues the counter-based streams of the parent,
+        so the results equal a single-threaded run; otherwise child k is seeded
+        with seed + k. Only pseudo-random runs can be split: QMC replicates and
+        antithetic pairs would be cut at the thread boundaries.
+        '''
+        if self.sampling != "pseudo":
+            raise ValueError(f"{self.sampling} sampling can't be split over threads, run it with threads=1")
+        starts = [k * self.attempts // threads for k in range(threads + 1)]
+        children = [Scenario(starts[k + 1] - starts[k], self.task, self.seed if self.replayable else self.seed + k,
+                             self.engine, self.record, self.sampling, self.replicates, self.qmc_dimensions,
+                             self.replayable, street=self.street, first_walk=self.first_walk + starts[k],
+                             pack_walks=self.pack_walks, index_walks=self.index_walks)
+                    for k in range(threads) if starts[k + 1] > starts[k]]
+        run_scenarios(children, method="run_codes", threads=threads)
+        self.table = WalkTable.concatenate([child.table for child in children])
+        for child in children:
+            self.walks.extend(child.walks)
+            self.recorded.extend(child.first_walk - self.first_walk + i for i in child.recorded)
+            if self.features is not None:
+                self.features.extend(child.features)
+        self.walk_index = self.attempts
+        return self.table["outcome"]
+
+    def run_tally(self, threads=1):
+        '''
+        Runs the games and returns only their OutcomeTally
+        '''
+        return OutcomeTally.from_codes(self.run_codes(threads))
+
+    def run_exposures(self):
+        '''
+        Runs self.attempts walks without collisions and returns their
+        ExposureTable, which gives survival and success rates for any hit
+        probability without running again
+        '''
+        danger = np.flatnonzero(self.street.get_danger_mask())
+        counts = np.zeros((self.attempts, len(danger)), dtype=np.int32)
+        success = np.zeros(self.attempts, dtype=bool)
+        for attempt in range(self.attempts):
+            reason, _ = self.play_walk(*self.walk_streams(attempt), hits=False)
+            counts[attempt] = [self.grid.zone_exposure[zone] for zone in danger]
+            success[attempt] = reason == "success"
+        return ExposureTable(counts, success, danger)
+
+    def replicate_estimates(self, rate="survival"):
+        '''
+        Survival or success fraction of every independent replicate of the last
+        run (QMC randomizations, antithetic pairs or single walks), with sizes
+        '''
+        codes = self.table["outcome"]
+        hits = codes != OUTCOME_CODES["crash"] if rate == "survival" else codes == OUTCOME_CODES["success"]
+        starts = np.array(self.replicate_starts())
+        sizes = np.diff(starts)
+        return np.add.reduceat(hits.astype(float), starts[:-1]) / sizes, sizes
+
+    def confidence_interval(self, rate="survival", level=0.95):
+        '''
+        Confidence interval, in percent, of the survival or success rate of the
+        last run; randomized-QMC and antithetic runs use their replicates
+        '''
+        if self.sampling == "pseudo":
+            return self.table.tally().confidence_interval(rate, level)
+        return replicate_interval(*self.replicate_estimates(rate), level=level)
+
+    def run_games(self, threads=1):
+        '''
+        Runs the function run_single_game, self.attempts times
+        '''
+        return [OUTCOMES[code] for code in self.run_codes(threads)] # Reasons why the game was aborted ("success"/"stay"/"crash")
+            
+    def build_walk_index(self):
+        '''
+        WalkIndex over the features of the recorded walks of a
+        Scenario(index_walks=True); its ids are positions in self.walks
+        '''
+        from walk_index import WalkIndex
+
+        if self.features is None:
+            raise ValueError("walk features are only kept by a Scenario(index_walks=True)")
+        return WalkIndex(self.features, None if self.replayable else self.walks)
+
+    def return_walks(self):
+        '''
+        Return walks function for convenience. Replayable runs regenerate the
+        recorded walks from their indices.
+        '''
+        if self.replayable:
+            return [self.replay(i) for i in self.recorded]
+        return self.walks
+
+
+def run_scenarios(scenarios, method="run_tally", threads=None):
+    '''
+    Runs several scenarios (e.g. tasks A, B and C) at the same time on a thread
+    pool and returns the results of the given method, in order. Every Scenario
+    draws from its own generator, so this is safe, and on free-threaded CPython
+    also parallel.
+    '''
+    with ThreadPoolExecutor(max_workers=threads or len(scenarios)) as pool:
+        return list(pool.map(lambda scenario: getattr(scenario, method)(), scenarios))
+
+
+class probability_computing:
+    '''
+    to compute the survival probability. Takes the outcome strings, an array of
+    outcome codes or an OutcomeTally.
+    '''
+    def __init__(self, result):
+        self.results = result
+        self.tally = result if isinstance(result, OutcomeTally) else OutcomeTally.from_codes(result)
+        self.number_of_sc = [0, 0]
+        self.survival = 0
+
+    def computing_survival_rate(self):
+        self.number_of_sc = [self.tally.success + self.tally.stay, self.tally.crash]
+        self.survival = self.tally.survival_rate()
+        return self.survival
+
+    def success_to_the_other_side(self):
+        self.number_of_sc = [self.tally.success, self.tally.crash]
+        self.success = self.tally.success_rate()
+        return self.success
+
+    def confidence_intervals(self, level=0.95):
+        return {"survival": self.tally.confidence_interval("survival", level),
+                "success": self.tally.confidence_interval("success", level)}
+                       
+    def print_results(self):
+        print(f"probability of survival: {self.survival}%")
+        print(f"probability of success: {self.success}%")
@@ -0,0 +1,228 @@
+'''
+Surrogate model of the survival and success rates over scenario parameters.
+
+A Surrogate of one task is a Gaussian process fitted to cached simulation
+results over a box of parameters (by default velocity, hit probability and
+the width of the dangerous zones). Queries are a dot product with the cached
+fit and come with a standard deviation. refine() adds simulation points where
+the model is least certain or changes fastest, and estimate() falls back to
+a real simulation (which then joins the cache) when the uncertainty of an
+answer is above the tolerance.
+
+Velocity needs no engine support: a walker of speed v on a street is the
+default walker (speed 2) on the street scaled by 2 / v. Task A walkers only
+stand on multiples of their step, so their rates jump wherever a zone edge
+crosses one; the smooth model blurs such jumps and estimate() with a small
+tolerance is the safer query there.
+'''
+import json
+import math
+
+import numpy as np
+
+from sampling import scrambled_halton
+from simulation import Scenario, Street, Zone
+
+PARAMETERS = {"velocity": (1., 3.), "hit_probability": (0., 0.2), "danger_width": (1., 4.)} # name -> (low, high)
+LENGTH_SCALES = (0.15, 0.25, 0.4, 0.6, 1., 1.6) # candidate GP length scales, in units of the box
+PRIOR_SIGNAL = 25. ** 2 # least signal variance, in percent squared: a rate could be anywhere in 0-100%
+
+
+def layout_street(velocity=2., hit_probability=0.05, danger_width=2.):
+    '''
+    The default street with both dangerous zones danger_width wide, scaled
+    for a walker of the given velocity
+    '''
+    scale = 2. / velocity
+    street = Street()
+    street.zones = [Zone("safe", 1 * scale), Zone("dangerous", danger_width * scale), Zone("safe", 2 * scale),
+                    Zone("dangerous", danger_width * scale), Zone("safe", 1 * scale)]
+    street.probability_of_hit_on_danger_zone = hit_probability
+    return street
+
+
+class Surrogate:
+    '''
+    Gaussian process surrogate of one task over the parameter box bounds.
+    street_factory builds the Street of a parameter point; every point is
+    simulated with attempts walks of the given engine.
+    '''
+    def __init__(self, task, bounds=None, street_factory=layout_street, attempts=4000, seed=43, engine="vectorized"):
+        self.task = task
+        self.bounds = dict(bounds or PARAMETERS)
+        self.names = list(self.bounds)
+        self.low = np.array([self.bounds[name][0] for name in self.names], dtype=float)
+        self.span = np.array([self.bounds[name][1] - self.bounds[name][0] for name in self.names], dtype=float)
+        self.street_factory = street_factory
+        self.attempts = attempts
+        self.seed = seed
+        self.engine = engine
+        self.samples = [] # {"params", "survival", "success", "walks"}, rates in percent
+        self.simulations = 0 # simulations run by this object, as opposed to loaded from a cache
+        self.fits = {}
+
+    def normalize(self, points):
+        return (np.atleast_2d(np.asarray(points, dtype=float)) - self.low) / self.span
+
+    def point(self, params):
+        missing = [name for name in self.names if name not in params]
+        if missing:
+            raise ValueError(f"missing parameters {missing}, expected {self.names}")
+        return np.array([params[name] for name in self.names], dtype=float)
+
+    def simulate(self, params):
+        '''
+        Runs one parameter point and adds it to the samples
+        '''
+        street = self.street_factory(**params)
+        scenario = Scenario(self.attempts, self.task, seed=self.seed + len(self.samples), engine=self.engine,
+                            record="none", street=street)
+        tally = scenario.run_tally()
+        self.simulations += 1
+        return self.add_result(params, tally.survival_rate(), tally.success_rate(), tally.total)
+
+    def add_result(self, params, survival, success, walks):
+        '''
+        Adds a result simulated elsewhere, rates in percent
+        '''
+        sample = {"params": {name: float(params[name]) for name in self.names}, "survival": float(survival),
+                  "success": float(success), "walks": int(walks)}
+        self.samples.append(sample)
+        self.fits = {}
+        return sample
+
+    def add_sweep(self, summaries, **fixed):
+        '''
+        Adds the points of this task from CLI sweep summaries; parameters a
+        summary does not have (all but hit_probability) come from fixed
+        '''
+        for summary in summaries:
+            if summary["task"] == self.task and summary.get("hit_probability") is not None:
+                params = dict(fixed, hit_probability=summary["hit_probability"])
+                self.add_result(params, summary["survival_rate"], summary["success_rate"], summary["attempts"])
+        return self
+
+    def design(self, n, seed=0):
+        '''
+        Simulates n space-filling points (scrambled Halton) of the box
+        '''
+        unit = scrambled_halton(n, len(self.names), np.random.default_rng(seed))
+        for row in self.low + unit * self.span:
+            self.simulate(dict(zip(self.names, row)))
+        return self
+
+    def fit(self, rate):
+        '''
+        GP fit of one rate: constant mean, squared exponential kernel with a
+        length scale per parameter (coordinate search on the marginal
+        likelihood) and the binomial variance of every sample as noise
+        '''
+        if rate in self.fits:
+            return self.fits[rate]
+        x = self.normalize([self.point(sample["params"]) for sample in self.samples])
+        y = np.array([sample[rate] for sample in self.samples])
+        p = np.clip(y / 100, 0.5 / self.attempts, 1 - 0.5 / self.attempts)
+        noise = p * (1 - p) / np.array([sample["walks"] for sample in self.samples]) * 1e4
+        # one sample or nearly equal ones say nothing about how far rates vary, hence the prior floor
+        mean, signal = y.mean(), max(y.var(), PRIOR_SIGNAL)
+        scales = np.full(len(self.names), LENGTH_SCALES[2])
+        best = self.likelihood(x, y - mean, noise, signal, scales)
+        for _ in range(2):
+            for j in range(len(scales)):
+                for scale in LENGTH_SCALES:
+                    trial = scales.copy()
+                    trial[j] = scale
+                    value = self.likelihood(x, y - mean, noise, signal, trial)
+                    if value > best:
+                        best, scales = value, trial
+        covariance = signal * np.exp(-0.5 * self.distances(x, x, scales)) + np.diag(noise)
+        inverse = np.linalg.inv(covariance)
+        self.fits[rate] = {"x": x, "mean": mean, "signal": signal, "scales": scales,
+                           "alpha": inverse @ (y - mean), "inverse": inverse}
+        return self.fits[rate]
+
+    @staticmethod
+    def distances(a, b, scales):
+        difference = (a[:, None, :] - b[None, :, :]) / scales
+        return (difference ** 2).sum(axis=2)
+
+    def likelihood(self, x, y, noise, signal, scales):
+        covariance = signal * np.exp(-0.5 * self.distances(x, x, scales)) + np.diag(noise)
+        try:
+            factor = np.linalg.cholesky(covariance)
+        except np.linalg.LinAlgError:
+            return -math.inf
+        z = np.linalg.solve(factor, y)
+        return float(-0.5 * z @ z - np.log(np.diag(factor)).sum())
+
+    def predict_points(self, points, rate="survival"):
+        '''
+        Mean and standard deviation, in percent, at an (m, parameters) array;
+        without any samples the mean is unknown (nan) and the deviation infinite
+        '''
+        if not self.samples:
+            n = len(self.normalize(points))
+            return np.full(n, np.nan), np.full(n, np.inf)
+        fit = self.fit(rate)
+        k = fit["signal"] * np.exp(-0.5 * self.distances(self.normalize(points), fit["x"], fit["scales"]))
+        mean = fit["mean"] + k @ fit["alpha"]
+        variance = fit["signal"] - np.einsum("ij,jk,ik->i", k, fit["inverse"], k)
+        return np.clip(mean, 0., 100.), np.sqrt(np.maximum(variance, 0.))
+
+    def predict(self, rate="survival", **params):
+        '''
+        (rate, standard deviation) in percent at one parameter point
+        '''
+        mean, std = self.predict_points(self.point(params)[None, :], rate)
+        return float(mean[0]), float(std[0])
+
+    def estimate(self, tolerance=1., rate="survival", **params):
+        '''
+        The surrogate's answer when its standard deviation is within
+        tolerance (percentage points), else a simulation of the point
+        '''
+        value, std = self.predict(rate, **params)
+        if std <= tolerance:
+            return {"rate": value, "std": std, "source": "surrogate"}
+        sample = self.simulate(params)
+        p = sample[rate] / 100
+        return {"rate": sample[rate], "std": math.sqrt(p * (1 - p) / sample["walks"]) * 100, "source": "simulation"}
+
+    def refine(self, points=10, candidates=512, rate="survival", seed=1):
+        '''
+        Adaptive sampling: simulates, one at a time, the candidate point with
+        the largest standard deviation plus change of the mean over a
+        nearest-sample distance
+        '''
+        generator = np.random.default_rng(seed)
+        if not self.samples:
+            self.design(1) # candidates are scored against the fit, so it needs a first point
+            points -= 1
+        for _ in range(points):
+            unit = generator.random((candidates, len(self.names)))
+            grid = self.low + unit * self.span
+            mean, std = self.predict_points(grid, rate)
+            fit = self.fit(rate)
+            spacing = np.sqrt(self.distances(unit, fit["x"], np.ones(len(self.names))).min(axis=1))
+            step = 0.05 * self.span
+            slope = np.zeros(len(grid))
+            for j in range(len(self.names)):
+                shifted = grid.copy()
+                shifted[:, j] += step[j]
+                slope += ((self.predict_points(shifted, rate)[0] - mean) / 0.05) ** 2
+            score = std + np.sqrt(slope) * spacing
+            self.simulate(dict(zip(self.names, grid[np.argmax(score)])))
+        return self
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({"task": self.task, "bounds": self.bounds, "attempts": self.attempts, "samples": self.samples}, f)
+
+    @classmethod
+    def load(cls, path, street_factory=layout_street, engine="vectorized"):
+        with open(path) as f:
+            data = json.load(f)
+        surrogate = cls(data["task"], {name: tuple(bounds) for name, bounds in data["bounds"].items()}, street_factory,
+                        data["attempts"], engine=engine)
+        surrogate.samples = data["samples"]
+        return surrogate
@@ -0,0 +1,19 @@
+'''
+engine="auto" only trades accuracy for speed when the caller asks for it.
+'''
+import autotune
+from simulation import Scenario
+
+
+def test_jump_is_only_a_candidate_when_approximate():
+    for task in ("B", "C"):
+        assert "jump" not in autotune.engine_candidates(task, "none")
+        assert "jump" in autotune.engine_candidates(task, "none", approximate=True)
+
+
+def test_auto_keeps_task_b_exact(tmp_path, monkeypatch):
+    monkeypatch.setenv("WAYHOME_CACHE", str(tmp_path / "engines.json"))
+    monkeypatch.setattr(autotune, "CACHE", {})
+    scenario = Scenario(2000, "B", engine="auto", record="none")
+    assert scenario.engine != "jump" and "jump" not in scenario.engine_estimates
+    assert "jump" in Scenario(2000, "B", engine="auto", record="none", approximate=True).engine_estimates
@@ -0,0 +1,58 @@
+'''
+Engine results that later engine work must not change: the reference engine
+against the baseline, and fast_a against the exact task A distribution.
+'''
+import math
+
+import pytest
+
+from exact import task_a_hitting_times
+from simulation import OutcomeTally, Scenario, Street, Zone
+
+# Scenario(2000, task) with the default seed 43, as the baseline code gives them
+BASELINE = {"A": OutcomeTally(1741, 0, 259), "B": OutcomeTally(582, 1198, 220), "C": OutcomeTally(602, 1212, 186)}
+
+
+@pytest.mark.parametrize("task", sorted(BASELINE))
+def test_reference_engine_matches_baseline(task):
+    assert Scenario(2000, task).run_tally() == BASELINE[task]
+
+
+def narrow_street():
+    street = Street()
+    street.zones = [Zone("safe", 1), Zone("dangerous", 3), Zone("safe", 1)]
+    street.probability_of_hit_on_danger_zone = 0.1
+    return street
+
+
+@pytest.mark.parametrize("street", [Street(), narrow_street()], ids=["default", "narrow"])
+def test_fast_a_matches_exact_hitting_times(street):
+    n = 40000
+    scenario = Scenario(n, "A", engine="fast_a", record="none", street=street)
+    tally = scenario.run_tally()
+    exact = task_a_hitting_times(street)
+    p = exact.survival_rate() / 100
+    assert abs(tally.survival_rate() / 100 - p) < 4 * math.sqrt(p * (1 - p) / n)
+    assert scenario.table["time"].mean() == pytest.approx(exact.mean_steps(), rel=0.02)
+
+
+def test_fast_a_rejects_replayable_runs():
+    with pytest.raises(ValueError):
+        Scenario(10, "A", engine="fast_a", record="none", replayable=True)
+
+
+@pytest.mark.parametrize("sampling", ["qmc", "antithetic"])
+def test_threaded_runs_need_pseudo_random_sampling(sampling):
+    with pytest.raises(ValueError):
+        Scenario(101, "B", sampling=sampling, replayable=True).run_codes(threads=3)
+
+
+def test_threaded_replayable_run_equals_single_threaded():
+    single = Scenario(101, "B", record="all", replayable=True)
+    single.run_codes()
+    threaded = Scenario(101, "B", record="all", replayable=True)
+    threaded.run_codes(threads=3)
+    assert threaded.recorded == single.recorded
+    for name in ("outcome", "steps", "final_x", "final_y"):
+        assert (threaded.table[name] == single.table[name]).all()
+    assert threaded.replay(57) == single.replay(57)
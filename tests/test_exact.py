@@ -0,0 +1,24 @@
+import pytest
+
+from exact import task_a_hitting_times
+from simulation import Street, Zone
+
+
+@pytest.mark.parametrize("zones", [
+    [Zone("dangerous", 2)],
+    [Zone("safe", 1)],
+    [Zone("safe", 1), Zone("dangerous", 2)],
+    None, # the default street
+])
+def test_task_a_mass_is_conserved(zones):
+    street = Street()
+    if zones:
+        street.zones = zones
+    times = task_a_hitting_times(street)
+    assert times.crash.sum() + times.success.sum() + times.stay.sum() + times.remaining == pytest.approx(1.)
+
+
+def test_one_step_street_is_always_crossed():
+    street = Street()
+    street.zones = [Zone("dangerous", 2)]
+    assert task_a_hitting_times(street).success_rate() == pytest.approx(100.)
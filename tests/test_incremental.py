@@ -0,0 +1,49 @@
+import copy
+
+import numpy as np
+import pytest
+
+from incremental import IncrementalRun
+from simulation import Scenario, Street, WalkTable, Zone
+
+
+def full_rerun(task, street, attempts):
+    scenario = Scenario(attempts, task, record="none", replayable=True, street=copy.deepcopy(street))
+    scenario.run_codes()
+    return scenario.table
+
+
+def assert_same_table(a, b):
+    for name in WalkTable.COLUMNS:
+        np.testing.assert_array_equal(a[name], b[name], err_msg=name)
+
+
+EDITS = [
+    lambda street: setattr(street.zones[3], "length", 3), # widen the second dangerous zone
+    lambda street: setattr(street.zones[1], "length", 1),
+    lambda street: setattr(street, "probability_of_hit_on_danger_zone", 0.08),
+    lambda street: street.zones.append(Zone("dangerous", 1.5)),
+    lambda street: street.zones.insert(2, Zone("safe", 0.)),
+    lambda street: street.zones.__setitem__(2, Zone("dangerous", 2)),
+    lambda street: street.zones.pop(),
+]
+
+
+@pytest.mark.parametrize("task", ["A", "B", "C"])
+def test_updates_match_full_rerun(task):
+    attempts = 600
+    run = IncrementalRun(attempts, task)
+    street = Street()
+    assert_same_table(run.run(), full_rerun(task, street, attempts))
+    for edit in EDITS:
+        edit(street) # edited in place, one after the other
+        run.update(street)
+        assert_same_table(run.table, full_rerun(task, street, attempts))
+
+
+def test_unrelated_edit_replays_nothing():
+    run = IncrementalRun(300, "B")
+    run.run()
+    street = copy.deepcopy(run.street)
+    street.zones.insert(2, Zone("safe", 0.)) # an empty zone changes no position
+    assert len(run.update(street)) == 0
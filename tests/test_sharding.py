@@ -0,0 +1,32 @@
+import json
+import socket
+import threading
+
+from runners import run_scenario
+from sharding import Coordinator, run_local, run_single_process, run_worker, send
+
+POINTS = [("A", None), ("B", 0.1)]
+
+
+def test_sharded_run_matches_single_process():
+    single = run_single_process(POINTS, 900, chunk_size=300)
+    assert run_local(POINTS, 900, chunk_size=300, workers=2) == single
+    for (task, hit_probability), summary in zip(POINTS, single):
+        direct, _, _ = run_scenario(task, 900, chunk_size=300, hit_probability=hit_probability)
+        assert {key: summary[key] for key in ("success", "stay", "crash")} == \
+               {key: direct[key] for key in ("success", "stay", "crash")}
+
+
+def test_silent_worker_shard_is_handed_out_again():
+    coordinator = Coordinator(POINTS, 600, chunk_size=300, shard_timeout=0.5, walk_timeout=0.)
+    results = []
+    runner = threading.Thread(target=lambda: results.append(coordinator.run()))
+    runner.start()
+    with socket.create_connection(coordinator.address) as connection, connection.makefile("rwb") as stream:
+        send(stream, {"type": "ready"})
+        assert json.loads(stream.readline())["type"] == "shard" # then never answers, like a cut-off node
+        worker = threading.Thread(target=run_worker, args=coordinator.address)
+        worker.start()
+        runner.join(timeout=60)
+        worker.join(timeout=60)
+    assert results == [run_single_process(POINTS, 600, chunk_size=300)]
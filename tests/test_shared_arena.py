@@ -0,0 +1,27 @@
+import gc
+
+from runners import run_scenario
+from shared_arena import PackedWalks, SharedArena, walks_arena
+
+
+def test_column_outlives_shared_table():
+    summary, table, _ = run_scenario("A", 4000, workers=2, chunk_size=1000)
+    outcome = table["outcome"][1000:]
+    del table
+    gc.collect()
+    assert int((outcome == 2).sum()) + int((outcome == 0).sum()) == 3000
+    assert summary["crash"] >= int((outcome == 2).sum())
+
+
+def test_walks_outlive_their_arena():
+    walks = [[(0., 0.), (0., 2.), (1., 3.)], [(0., 0.), (0., 2.)]]
+    created = walks_arena(walks)
+    arena = SharedArena.attach(created.spec())
+    created.close()
+    arena.unlink()
+    packed = PackedWalks(arena["positions"], arena["lengths"])
+    del arena
+    first = packed[0]
+    del packed
+    gc.collect()
+    assert first.tolist() == [[0., 0.], [0., 2.], [1., 3.]]
@@ -0,0 +1,17 @@
+from surrogate import Surrogate
+
+NEAR = {"velocity": 2., "hit_probability": 0.01, "danger_width": 2.}
+FAR = {"velocity": 2., "hit_probability": 0.2, "danger_width": 4.}
+
+
+def test_empty_surrogate_simulates():
+    surrogate = Surrogate("B", attempts=500)
+    assert surrogate.estimate(1., **NEAR)["source"] == "simulation"
+
+
+def test_far_query_after_one_sample_simulates():
+    surrogate = Surrogate("B", attempts=500)
+    surrogate.simulate(NEAR)
+    assert surrogate.predict(**FAR)[1] > 10.
+    assert surrogate.estimate(1., **FAR)["source"] == "simulation"
+    assert surrogate.estimate(2., **NEAR)["source"] == "surrogate"
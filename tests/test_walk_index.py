@@ -0,0 +1,24 @@
+'''
+WalkIndex.top against a plain stable sort, ties included.
+'''
+import numpy as np
+
+from walk_index import FEATURES, WalkIndex
+
+
+def make_index(steps):
+    n = len(steps)
+    features = {name: np.zeros(n, dtype=dtype) for name, dtype in FEATURES.items()}
+    features["steps"] = np.asarray(steps, dtype=np.int32)
+    features["zone_entries"] = np.zeros((n, 1), dtype=np.uint16)
+    return WalkIndex(features)
+
+
+def test_top_keeps_lower_ids_among_ties():
+    assert make_index([5, 5, 5]).top("steps", 1).tolist() == [0]
+    rng = np.random.default_rng(0)
+    steps = rng.integers(0, 6, 200)
+    index = make_index(steps)
+    for k in (0, 1, 7, 50, 200, 300):
+        assert index.top("steps", k).tolist() == np.lexsort((np.arange(200), -steps))[:k].tolist()
+        assert index.top("steps", k, largest=False).tolist() == np.lexsort((np.arange(200), steps))[:k].tolist()
@@ -0,0 +1,182 @@
+'''
+Agent-based traffic mode: instead of a flat hit probability per step in the
+dangerous zones, cars drive along the lanes (the dangerous zones of a Street)
+and many walkers cross at the same time. Cars and walkers are kept in NumPy
+arrays and advanced together, once per tick.
+'''
+import numpy as np
+
+from kernels import get_kernel
+from simulation import OUTCOME_CODES, Street, WalkTable
+
+
+class SpatialHash:
+    '''
+    Uniform grid over (lane, x) cells of a periodic road. Cars are bucketed by
+    sorting their cell keys, so finding the cars near a walker is a couple of
+    binary searches instead of a check against every car.
+    '''
+    def __init__(self, road_length, cell_size, lanes):
+        self.road_length = road_length
+        self.cells = max(int(road_length // cell_size), 1)
+        self.cell_size = road_length / self.cells
+        self.lanes = lanes
+
+    def keys(self, lane, x):
+        cell = (np.floor(x / self.cell_size).astype(np.int64)) % self.cells
+        return lane * self.cells + cell
+
+    def build(self, lane, x):
+        '''
+        Indexes the cars; must be called again whenever they moved
+        '''
+        keys = self.keys(lane, x)
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    def candidates(self, lane, x):
+        '''
+        Pairs (query index, car index) of everything in the same or the
+        neighbouring cells of each query point
+        '''
+        cell = (np.floor(x / self.cell_size).astype(np.int64)) % self.cells
+        queries, cars = [], []
+        # with fewer than three cells the neighbours wrap onto the same cells, so every cell is checked once
+        for offset in (-1, 0, 1) if self.cells >= 3 else range(self.cells):
+            keys = lane * self.cells + (cell + offset) % self.cells
+            lo = np.searchsorted(self.sorted_keys, keys, side="left")
+            hi = np.searchsorted(self.sorted_keys, keys, side="right")
+            counts = hi - lo
+            total = counts.sum()
+            if total == 0:
+                continue
+            starts = np.repeat(lo, counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            queries.append(np.repeat(np.arange(len(keys)), counts))
+            cars.append(self.order[starts + offsets])
+        if not queries:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(queries), np.concatenate(cars)
+
+
+class TrafficSimulation:
+    '''
+    Walkers of one task crossing a Street whose dangerous zones carry traffic.
+    The road is a periodic segment of road_length meters; cars in neighbouring
+    lanes drive in opposite directions. A walker is hit when it stands in a
+    lane within reach of a car that passed during the tick.
+    '''
+    def __init__(self, walkers, task, street=None, cars_per_lane=5, car_speed=4., car_length=4.5,
+                 walker_radius=0.3, road_length=200., velocity=2, seed=43):
+        self.task = task
+        self.kernel = get_kernel(task)
+        self.street = street or Street()
+        self.rng = np.random.default_rng(seed)
+        self.velocity = velocity
+        self.car_speed = car_speed
+        self.car_length = car_length
+        self.walker_radius = walker_radius
+        self.road_length = road_length
+
+        self.edges = self.street.get_zone_edges()
+        self.lane_zones = np.flatnonzero(self.street.get_danger_mask()) # zone index of every lane
+        lanes = len(self.lane_zones)
+        self.car_lane = np.repeat(np.arange(lanes), cars_per_lane)
+        self.car_x = self.rng.uniform(0, road_length, size=len(self.car_lane))
+        self.car_direction = np.where(self.car_lane % 2 == 0, 1., -1.)
+        self.lane_of_zone = np.full(len(self.street.zones), -1)
+        self.lane_of_zone[self.lane_zones] = np.arange(lanes)
+        # a car sweeps car_speed meters per tick, so a cell must cover that plus the car and the walker
+        self.hash = SpatialHash(road_length, car_length + car_speed + 2 * walker_radius, lanes)
+
+        # walkers start spread along the road, after their first (straight) step
+        self.x = self.rng.uniform(0, road_length, size=walkers)
+        self.y = np.zeros(walkers)
+        self.heading = np.zeros(walkers)
+        self.time = np.zeros(walkers)
+        self.steps = np.ones(walkers, dtype=np.int32)
+        self.danger_exposure = np.zeros(walkers, dtype=np.int32)
+        self.outcome = np.zeros(walkers, dtype=np.uint8)
+        self.crash_zone = np.full(walkers, -1, dtype=np.int16)
+        self.active = np.ones(walkers, dtype=bool)
+        self.kernel.batch_first_step(self, np.arange(walkers), velocity, self.rng)
+        self.ticks = 0
+
+    def move_walkers(self, index):
+        '''
+        One step of Drunk.move for every walker in index, with the batch step
+        of the task's movement kernel
+        '''
+        self.kernel.batch_step(self, index, self.velocity, self.rng)
+        self.time[index] += 1
+        self.steps[index] += 1
+
+    def move_cars(self):
+        self.car_x = (self.car_x + self.car_direction * self.car_speed) % self.road_length
+
+    def collisions(self, index, zone):
+        '''
+        Which walkers in index (standing in lanes) were hit during this tick
+        '''
+        lane = self.lane_of_zone[zone]
+        walker_x = self.x[index] % self.road_length
+        # the car occupied everything between its old and new position this tick
+        car_middle = (self.car_x - self.car_direction * self.car_speed / 2) % self.road_length
+        self.hash.build(self.car_lane, car_middle)
+        walkers, cars = self.hash.candidates(lane, walker_x)
+        distance = (walker_x[walkers] - car_middle[cars] + self.road_length / 2) % self.road_length - self.road_length / 2
+        reach = (self.car_length + self.car_speed) / 2 + self.walker_radius
+        hit = np.zeros(len(index), dtype=bool)
+        hit[walkers[np.abs(distance) < reach]] = True
+        return hit
+
+    def tick(self):
+        '''
+        Advances every active walker by one step and every car by one tick,
+        then settles the walkers that crashed or left the street
+        '''
+        index = np.flatnonzero(self.active)
+        self.move_walkers(index)
+        self.move_cars()
+        zone = self.street.get_zone_indices(self.y[index])
+        in_lane = zone >= 0
+        in_lane[in_lane] = self.lane_of_zone[zone[in_lane]] >= 0
+        self.danger_exposure[index[in_lane]] += 1
+
+        crashed = np.zeros(len(index), dtype=bool)
+        if in_lane.any():
+            crashed[in_lane] = self.collisions(index[in_lane], zone[in_lane])
+        success = ~crashed & (self.y[index] >= self.edges[-1])
+        stay = ~crashed & (self.y[index] < 0)
+        self.outcome[index[crashed]] = OUTCOME_CODES["crash"]
+        self.crash_zone[index[crashed]] = zone[crashed]
+        self.outcome[index[success]] = OUTCOME_CODES["success"]
+        self.outcome[index[stay]] = OUTCOME_CODES["stay"]
+        self.active[index[crashed | success | stay]] = False
+        self.ticks += 1
+
+    def run(self, max_ticks=None):
+        '''
+        Ticks until every walker is done (or max_ticks passed) and returns the
+        per-walker WalkTable; its tally() feeds probability_computing
+        '''
+        while self.active.any() and (max_ticks is None or self.ticks < max_ticks):
+            self.tick()
+        return WalkTable({
+            "outcome": self.outcome,
+            "steps": self.steps,
+            "time": self.time,
+            "final_x": self.x,
+            "final_y": self.y,
+            "crash_zone": self.crash_zone,
+            "danger_exposure": self.danger_exposure,
+        })
+
+
+if __name__ == "__main__":
+    from simulation import probability_computing
+
+    for task in ["A", "B", "C"]:
+        table = TrafficSimulation(walkers=10000, task=task, cars_per_lane=500, road_length=20000.).run()
+        probability = probability_computing(table.tally())
+        print(f"{task}: survival {probability.computing_survival_rate():.1f}%, success {probability.success_to_the_other_side():.1f}%")
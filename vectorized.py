@@ -0,0 +1,58 @@
+'''
+Vectorized engine, Scenario(engine="vectorized"): every walk of a batch is
+a row of WalkerArrays, moved by the batch step of the task's movement kernel
+(kernels.py) and checked against the street with array operations. Draws
+come from a NumPy generator seeded with the scenario's seed, so the walks
+differ from the reference ones but follow the same distribution; walks are
+neither recorded nor replayable.
+'''
+import numpy as np
+
+from kernels import WalkerArrays
+from simulation import OUTCOME_CODES, Drunk
+
+
+def run_vectorized(scenario, batch_size=100000):
+    '''
+    Runs the walks of a scenario as arrays, batch_size at a time, with the
+    batch step of its movement kernel and vectorized Grid checks. Fills
+    scenario.table and returns the outcome codes.
+    '''
+    generator = np.random.default_rng(scenario.seed)
+    velocity = Drunk(scenario.task, kernel=scenario.kernel).velocity
+    size = scenario.street.get_street_size()
+    danger = np.append(scenario.street.get_danger_mask(), False) # index -1 (off the street) is safe
+    p = scenario.street.probability_of_hit_on_danger_zone
+    scenario.table = scenario.new_table()
+    columns = scenario.table.columns
+    for start in range(0, scenario.attempts, batch_size):
+        n = min(batch_size, scenario.attempts - start)
+        walkers = WalkerArrays(n)
+        steps = np.ones(n, dtype=np.int32)
+        exposure = np.zeros(n, dtype=np.int32)
+        outcome = np.zeros(n, dtype=np.uint8)
+        crash_zone = np.full(n, -1, dtype=np.int16)
+        active = np.arange(n)
+        scenario.kernel.batch_first_step(walkers, active, velocity, generator)
+        while len(active):
+            scenario.kernel.batch_step(walkers, active, velocity, generator)
+            walkers.time[active] += 1
+            steps[active] += 1
+            y = walkers.y[active]
+            zone = scenario.street.get_zone_indices(y)
+            in_danger = danger[zone]
+            exposure[active[in_danger]] += 1
+            crashed = in_danger & (generator.random(len(active)) < p)
+            success = ~crashed & (y >= size)
+            stay = ~crashed & (y < 0)
+            outcome[active[crashed]] = OUTCOME_CODES["crash"]
+            crash_zone[active[crashed]] = zone[crashed]
+            outcome[active[success]] = OUTCOME_CODES["success"]
+            outcome[active[stay]] = OUTCOME_CODES["stay"]
+            active = active[~(crashed | success | stay)]
+        rows = slice(start, start + n)
+        columns["outcome"][rows], columns["steps"][rows], columns["time"][rows] = outcome, steps, walkers.time
+        columns["final_x"][rows], columns["final_y"][rows] = walkers.x, walkers.y
+        columns["crash_zone"][rows], columns["danger_exposure"][rows] = crash_zone, exposure
+    scenario.walk_index = scenario.attempts
+    return columns["outcome"]
@@ -0,0 +1,149 @@
+'''
+Plotting of walks and results. Imported lazily, only when something is drawn.
+'''
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+
+from simulation import Street
+
+
+def lttb_downsample(points, threshold):
+    '''
+    Largest-triangle-three-buckets downsampling of an (n, 2) array of points.
+    Keeps the first and last point and, per bucket, the point spanning the
+    largest triangle with its neighbours, so the shape of the walk survives.
+    '''
+    points = np.asarray(points, dtype=float)
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return points
+    sampled = np.empty((threshold, 2))
+    sampled[0] = points[0]
+    sampled[-1] = points[-1]
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int) # bucket borders over the inner points
+    a = points[0]
+    for i in range(threshold - 2):
+        bucket = points[edges[i]:max(edges[i + 1], edges[i] + 1)]
+        following = points[edges[i + 1]:max(edges[i + 2], edges[i + 1] + 1)] if i + 2 < len(edges) else points[-1:]
+        c = following.mean(axis=0) # average point of the next bucket
+        areas = np.abs((a[0] - c[0]) * (bucket[:, 1] - a[1]) - (a[0] - bucket[:, 0]) * (c[1] - a[1]))
+        a = bucket[np.argmax(areas)]
+        sampled[i + 1] = a
+    return sampled
+
+
+def draw_street(ax, street=None):
+    '''
+    Highlights the dangerous zones of the street
+    '''
+    street = street or Street()
+    current_position = 0
+    for zone in street.zones:
+        if zone.zone_type == 'dangerous':
+            ax.axhspan(current_position, current_position + zone.length, color='red', alpha=0.3)
+        current_position += zone.length
+
+
+def draw_walks(ax, walks, street=None, max_points=200, color='tab:blue', alpha=0.3, linewidth=0.8):
+    '''
+    Draws the walks, each downsampled with LTTB to at most max_points points,
+    as a single LineCollection over the street
+    '''
+    draw_street(ax, street)
+    segments = [lttb_downsample(walk, max_points) for walk in walks if len(walk) > 1]
+    lines = LineCollection(segments, colors=color, alpha=alpha, linewidths=linewidth)
+    ax.add_collection(lines)
+    ax.autoscale_view()
+    ax.set_xlabel('x')
+    ax.set_ylabel('y')
+    ax.set_title(f'{len(segments)} walks')
+    return lines
+
+
+def draw_survival_bars(ax, labels, survival_values, success_values):
+    '''
+    Side-by-side survival and success bars, in percent, one pair per scenario
+    '''
+    x = np.arange(len(labels))  # Set positions for the x-axis
+    width = 0.35  # Width of each bar
+    ax.bar(x - width/2, survival_values, width, color='blue', alpha=0.7, label='Survival Probability')
+    ax.bar(x + width/2, success_values, width, color='red', alpha=0.7, label='Success Probability')
+    ax.set_xlabel('Scenario')
+    ax.set_ylabel('(%)')
+    ax.set_title('Probability for Each Scenario')
+    ax.set_xticks(x)
+    ax.set_xticklabels(labels)
+    ax.legend()
+
+
+def draw_heatmap(ax, values, rows, columns, label='(%)', title=None):
+    '''
+    A (rows, columns) grid of values, e.g. the survival rate of every task
+    and hit probability of a sweep, annotated cell by cell
+    '''
+    values = np.asarray(values, dtype=float)
+    image = ax.imshow(values, cmap='viridis', aspect='auto')
+    ax.figure.colorbar(image, ax=ax, label=label)
+    ax.set_xticks(np.arange(len(columns)))
+    ax.set_xticklabels(columns)
+    ax.set_yticks(np.arange(len(rows)))
+    ax.set_yticklabels(rows)
+    for i in range(values.shape[0]):
+        for j in range(values.shape[1]):
+            ax.text(j, i, f'{values[i, j]:.1f}', ha='center', va='center', color='white', fontsize=8)
+    if title:
+        ax.set_title(title)
+    return image
+
+
+class Visualize:
+    '''
+    Implement a Visualize class here to visualize movements and results
+    '''
+    def __init__(self):
+        pass
+            
+
+    def plot_the_walk(self,position):
+        plt.ion() #turn on interactive mode
+        self.fig, self.ax = plt.subplots()  # Create figure and axis
+        self.ax.set_xlim(-10, 10) 
+        self.ax.set_ylim(-2, 8)
+        # Plot the background highlights
+        highlight_regions = [(1, 3), (5, 7)]
+        for start, end in highlight_regions:
+            self.ax.axhspan(start, end, color='red', alpha=0.3)
+
+        self.line, = self.ax.plot([], [], marker='o')  # Initialize the line for plotting
+
+        x=[(t[0]) for t in position[2]] # Extractthe first values from the 2nd walk 
+        y=[(t[1]) for t in position[2]] # Extract the second values from the 2nd walk 
+        self.line.set_xdata(x)
+        self.line.set_ydata(y)
+        self.ax.relim()  # Recalculate limits
+        self.ax.autoscale_view()  # Rescale plot view
+        plt.draw()
+        plt.show()  # Show the final plot
+
+
+    def plot_walks(self, walks, max_points=200, street=None, color='tab:blue', alpha=0.3, linewidth=0.8):
+        '''
+        Overlay many walks (as returned by return_walks()) on one figure. Every
+        walk is downsampled with LTTB to at most max_points points and all of
+        them are drawn as a single LineCollection.
+        '''
+        self.fig, self.ax = plt.subplots()
+        self.lines = draw_walks(self.ax, walks, street, max_points, color, alpha, linewidth)
+        plt.show()
+        return self.lines
+
+    def plot_survival_rate(self,survival_values,project_list, success_values):
+        self.fig, self.ax = plt.subplots()
+        draw_survival_bars(self.ax, project_list, survival_values, success_values)
+    
+        plt.show()
+
+        print(f"scenario x: {project_list}")
+        print(f"survival rate y: {survival_values}")
+        print(f"success rate y2: {success_values}")
@@ -0,0 +1,221 @@
+'''
+Per-walk features of recorded walks and indexes to query them.
+
+When a Scenario(index_walks=True) records a walk it also stores a row of
+WalkFeatures: outcome, steps, path length, the x and y extent, and for every
+zone of the street how many times the walk entered it. A WalkIndex over the
+features answers range and top-k queries from sorted orders (binary searches
+instead of a scan) and outcome / zone-visit queries from bitmaps, and returns
+walk ids, i.e. positions in Scenario.walks. Queries combine by intersecting
+their id arrays:
+
+    index = scenario.build_walk_index()
+    twice = index.select(index.outcome("crash"), index.entries(3, at_least=2))
+    drifted = index.range("drift", low=10)
+    longest = index.top("steps", 100)
+'''
+import numpy as np
+
+from simulation import OUTCOME_CODES, load_walk_table
+
+FEATURES = {
+    "walk": np.int64,        # index of the walk within its run, the row of Scenario.table
+    "outcome": np.uint8,
+    "steps": np.int32,
+    "path_length": np.float64,
+    "min_x": np.float64,
+    "max_x": np.float64,
+    "min_y": np.float64,
+    "max_y": np.float64,
+    "drift": np.float64,     # largest sideways distance from the start
+}
+
+
+class WalkFeatures:
+    '''
+    Columnar feature rows, one per recorded walk, plus an (n, zones) array
+    of zone entry counts. Rows are appended as walks are recorded; the
+    arrays grow by doubling.
+    '''
+    def __init__(self, edges, capacity=64):
+        self.edges = np.asarray(edges, dtype=float)
+        self.zones = len(self.edges) - 1
+        self.n = 0
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in FEATURES.items()}
+        self.zone_entries = np.zeros((capacity, self.zones), dtype=np.uint16)
+
+    def grow(self):
+        self.columns = {name: np.concatenate((column, np.zeros_like(column))) for name, column in self.columns.items()}
+        self.zone_entries = np.concatenate((self.zone_entries, np.zeros_like(self.zone_entries)))
+
+    def append(self, walk, code, walk_index, steps=None):
+        '''
+        Computes and stores the features of one walk given as its positions
+        '''
+        if self.n == len(self.zone_entries):
+            self.grow()
+        positions = np.asarray(walk, dtype=float).reshape(-1, 2)
+        x, y = positions[:, 0], positions[:, 1]
+        zone = np.searchsorted(self.edges, y, side="right") - 1
+        on_street = (zone >= 0) & (zone < self.zones)
+        entered = on_street & np.concatenate(([True], zone[1:] != zone[:-1]))
+        row = self.n
+        columns = self.columns
+        columns["walk"][row] = walk_index
+        columns["outcome"][row] = code
+        columns["steps"][row] = len(positions) - 1 if steps is None else steps
+        columns["path_length"][row] = np.hypot(*np.diff(positions, axis=0).T).sum()
+        columns["min_x"][row], columns["max_x"][row] = x.min(), x.max()
+        columns["min_y"][row], columns["max_y"][row] = y.min(), y.max()
+        columns["drift"][row] = np.abs(x - x[0]).max()
+        self.zone_entries[row] = np.bincount(zone[entered], minlength=self.zones)
+        self.n += 1
+
+    def extend(self, other, walk_offset=0):
+        '''
+        Appends the rows of another WalkFeatures, shifting its walk numbers
+        '''
+        while self.n + other.n > len(self.zone_entries):
+            self.grow()
+        for name, column in self.columns.items():
+            column[self.n:self.n + other.n] = other.columns[name][:other.n]
+        self.columns["walk"][self.n:self.n + other.n] += walk_offset
+        self.zone_entries[self.n:self.n + other.n] = other.zone_entries[:other.n]
+        self.n += other.n
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, name):
+        if name == "zone_entries":
+            return self.zone_entries[:self.n]
+        return self.columns[name][:self.n]
+
+
+class WalkIndex:
+    '''
+    Query indexes over WalkFeatures (or the columns of a saved archive).
+    Sorted orders are built the first time a column is queried; the outcome
+    and zone-visit bitmaps up front. Every query returns sorted walk ids.
+    '''
+    def __init__(self, features, walks=None, orders=None):
+        self.columns = {name: features[name] for name in FEATURES}
+        self.zone_entries = features["zone_entries"]
+        self.walks = walks # the recorded walks the ids point into, if at hand
+        self.n = len(self.zone_entries)
+        self.orders = dict(orders or {}) # column -> argsort of the column
+        self.sorted_values = {} # column -> the column in that order
+        self.outcome_bitmaps = {outcome: np.packbits(self.columns["outcome"] == code)
+                                for outcome, code in OUTCOME_CODES.items()}
+        self.visit_bitmaps = [np.packbits(self.zone_entries[:, zone] > 0) for zone in range(self.zone_entries.shape[1])]
+
+    def __len__(self):
+        return self.n
+
+    def bitmap_ids(self, bitmap):
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.n))
+
+    def order(self, name):
+        '''
+        Walk ids sorted by a feature, cached; "entries_<zone>" sorts by the
+        entry count of a zone
+        '''
+        if name not in self.orders:
+            self.orders[name] = np.argsort(self.values(name), kind="stable")
+        return self.orders[name]
+
+    def sorted_column(self, name):
+        '''
+        A feature in the order of order(name), cached
+        '''
+        if name not in self.sorted_values:
+            self.sorted_values[name] = self.values(name)[self.order(name)]
+        return self.sorted_values[name]
+
+    def values(self, name):
+        if name.startswith("entries_"):
+            return self.zone_entries[:, int(name[len("entries_"):])]
+        if name not in self.columns:
+            raise ValueError(f"Invalid feature {name!r}, expected one of {tuple(FEATURES)} or entries_<zone>")
+        return self.columns[name]
+
+    def range(self, name, low=None, high=None):
+        '''
+        Walks with low <= feature <= high; either bound may be left out
+        '''
+        order, values = self.order(name), self.sorted_column(name)
+        start = 0 if low is None else np.searchsorted(values, low, side="left")
+        end = self.n if high is None else np.searchsorted(values, high, side="right")
+        return np.sort(order[start:end])
+
+    def top(self, name, k, largest=True):
+        '''
+        The k walks with the largest (or smallest) feature, best first
+        '''
+        order = self.order(name)
+        if not largest:
+            return order[:k] # the order is stable, so equal values keep the lower walk ids first
+        k = min(k, self.n)
+        if k == 0:
+            return order[:0]
+        # everything above the k-th largest value, then the lowest ids among the walks equal to it
+        values = self.sorted_column(name)
+        cut = values[self.n - k]
+        above = np.searchsorted(values, cut, side="right")
+        equal = np.searchsorted(values, cut, side="left")
+        selected = np.concatenate((order[above:], order[equal:equal + k - (self.n - above)]))
+        return selected[np.lexsort((selected, -self.values(name)[selected].astype(float)))]
+
+    def outcome(self, outcome):
+        if outcome not in self.outcome_bitmaps:
+            raise ValueError(f"Invalid outcome {outcome!r}, expected one of {tuple(self.outcome_bitmaps)}")
+        return self.bitmap_ids(self.outcome_bitmaps[outcome])
+
+    def visited(self, zone):
+        '''
+        Walks that set foot in a zone (an index into Street.zones)
+        '''
+        return self.bitmap_ids(self.visit_bitmaps[zone])
+
+    def entries(self, zone, at_least=1, at_most=None):
+        '''
+        Walks that entered a zone between at_least and at_most times
+        '''
+        return self.range(f"entries_{zone}", at_least, at_most)
+
+    @staticmethod
+    def select(*queries):
+        '''
+        Walks matching every query
+        '''
+        ids = queries[0]
+        for other in queries[1:]:
+            ids = np.intersect1d(ids, other, assume_unique=True)
+        return ids
+
+    def get_walks(self, ids):
+        '''
+        The recorded walks with the given ids
+        '''
+        if self.walks is None:
+            raise ValueError("this index has no walks attached, only their features")
+        return [self.walks[i] for i in ids]
+
+    def save(self, path):
+        '''
+        Writes the features and every sorted order built so far to an
+        uncompressed .npz, which load_walk_index memory-maps
+        '''
+        arrays = dict(self.columns, zone_entries=self.zone_entries)
+        arrays.update({f"order_{name}": order for name, order in self.orders.items()})
+        np.savez(path, **arrays)
+
+
+def load_walk_index(path, walks=None, mmap=True):
+    '''
+    Opens an index saved with WalkIndex.save; with mmap, features and orders
+    stay on disk and only the pages a query touches are read
+    '''
+    columns = load_walk_table(path, mmap).columns
+    orders = {name[len("order_"):]: column for name, column in columns.items() if name.startswith("order_")}
+    return WalkIndex(columns, walks, orders)
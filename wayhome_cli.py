@@ -0,0 +1,271 @@
+'''
+Command line entry point for running the simulator headless.
+
+    python wayhome_cli.py run --task B --attempts 100000 --workers 4 -o b.json
+    python wayhome_cli.py sweep --tasks A B C --hit-probabilities 0.01 0.05 0.1
+    python wayhome_cli.py bench --tasks A B C --attempts 2000
+    python wayhome_cli.py coordinate --tasks A B --attempts 10000000 --port 5555
+    python wayhome_cli.py worker --host coordinator-host --port 5555
+    python wayhome_cli.py render --sweep sweep.json --walks b.npz -d figures --workers 8
+    python wayhome_cli.py batch scenarios.jsonl --workers 8 > results.jsonl
+
+Nothing here plots interactively; results are written as JSON or NPZ and
+the render command draws them to image files.
+'''
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from sampling import SAMPLING_MODES
+from exposure import ExposureTable
+from kernels import KERNELS
+from runners import run_exposure_chunk, run_scenario, split_attempts
+from shared_arena import PackedWalks
+from simulation import ENGINE_CHOICES, OUTCOMES, RECORD_POLICIES, Street
+
+
+def write_results(path, fmt, summaries, table=None, walks=None):
+    '''
+    Writes the summaries as JSON (to stdout when no path is given) or, for
+    NPZ, the summaries together with the per-walk table columns and the
+    recorded walks.
+    '''
+    if fmt == "json":
+        text = json.dumps(summaries if len(summaries) > 1 else summaries[0], indent=2)
+        if path:
+            with open(path, "w") as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+        return
+    if not path:
+        raise SystemExit("--format npz needs an --output path")
+    arrays = {"summary": np.array(json.dumps(summaries))}
+    if table is not None:
+        arrays.update(table.columns)
+        arrays["outcome_names"] = np.array(OUTCOMES)
+    if walks:
+        if not isinstance(walks, PackedWalks):
+            walks = PackedWalks.from_walks(walks)
+        arrays["walk_lengths"] = walks.lengths
+        arrays["walk_positions"] = walks.positions
+    np.savez_compressed(path, **arrays)
+
+
+def add_common_options(parser, local=True):
+    '''
+    Options of every running command; the ones only a local run honours
+    (sampling, worker processes, approximate engines, recorded walks) are
+    left out otherwise
+    '''
+    parser.add_argument("--attempts", type=int, default=10000, help="walks per task")
+    parser.add_argument("--seed", type=int, default=43)
+    parser.add_argument("--engine", choices=ENGINE_CHOICES, default="reference", help="auto picks the fastest exact engine")
+    if local:
+        parser.add_argument("--sampling", choices=SAMPLING_MODES, default="pseudo",
+                            help="pseudo-random, randomized quasi-Monte Carlo or antithetic pairs")
+        parser.add_argument("--workers", type=int, default=1, help="worker processes")
+        parser.add_argument("--approximate", action="store_true",
+                            help="let --engine auto pick the approximate jump engine for tasks B and C")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="walks per worker job")
+    if local:
+        parser.add_argument("--record", choices=RECORD_POLICIES, default="none", help="which walks to keep")
+    parser.add_argument("--format", choices=("json", "npz"), default="json")
+    parser.add_argument("-o", "--output", help="output file (JSON goes to stdout by default)")
+
+
+def command_run(args):
+    summary, table, walks = run_scenario(args.task, args.attempts, args.seed, args.engine, args.record,
+                                         args.workers, args.chunk_size, args.hit_probability, args.sampling,
+                                         args.approximate)
+    write_results(args.output, args.format, [summary], table, walks)
+
+
+def reweighted_sweep(args):
+    '''
+    One collision-free run per task, evaluated at every hit probability
+    '''
+    summaries = []
+    for task in args.tasks:
+        jobs = [(task, n, args.seed + k, args.sampling) for k, n in enumerate(split_attempts(args.attempts, args.chunk_size))]
+        start = time.perf_counter()
+        if args.workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=args.workers) as pool:
+                exposures = ExposureTable.concatenate(list(pool.map(run_exposure_chunk, *zip(*jobs))))
+        else:
+            exposures = ExposureTable.concatenate([run_exposure_chunk(*job) for job in jobs])
+        elapsed = time.perf_counter() - start
+        hit_probabilities = args.hit_probabilities or [Street().probability_of_hit_on_danger_zone]
+        survival = exposures.survival_curve(hit_probabilities)
+        success = exposures.success_curve(hit_probabilities)
+        for point, hit_probability in enumerate(hit_probabilities):
+            summaries.append({
+                "task": task,
+                "attempts": args.attempts,
+                "seed": args.seed,
+                "engine": "reweight",
+                "sampling": args.sampling,
+                "hit_probability": hit_probability,
+                "survival_rate": float(survival[point]),
+                "survival_interval": exposures.confidence_interval(hit_probability, "survival"),
+                "success_rate": float(success[point]),
+                "success_interval": exposures.confidence_interval(hit_probability, "success"),
+                "seconds": elapsed,
+            })
+    return summaries
+
+
+def command_sweep(args):
+    if args.reweight:
+        write_results(args.output, args.format, reweighted_sweep(args))
+        return
+    summaries = []
+    for task in args.tasks:
+        for hit_probability in args.hit_probabilities or [None]:
+            summary, _, _ = run_scenario(task, args.attempts, args.seed, args.engine, "none",
+                                         args.workers, args.chunk_size, hit_probability, args.sampling,
+                                         args.approximate)
+            summaries.append(summary)
+    write_results(args.output, args.format, summaries)
+
+
+def command_bench(args):
+    summaries = []
+    for task in args.tasks:
+        for engine in args.engines or [args.engine]:
+            summary, _, _ = run_scenario(task, args.attempts, args.seed, engine, args.record,
+                                         args.workers, args.chunk_size, sampling=args.sampling,
+                                         approximate=args.approximate)
+            summary["walks_per_second"] = args.attempts / summary["seconds"]
+            summaries.append(summary)
+            print(f"{task} {summary['engine']:>10}: {summary['walks_per_second']:12.0f} walks/s", file=sys.stderr)
+    write_results(args.output, args.format, summaries)
+
+
+def command_coordinate(args):
+    from sharding import Coordinator
+
+    points = [(task, hit_probability) for task in args.tasks for hit_probability in args.hit_probabilities or [None]]
+    coordinator = Coordinator(points, args.attempts, args.seed, args.chunk_size, args.engine, args.host, args.port,
+                              args.shard_timeout)
+    print(f"coordinator listening on {coordinator.address[0]}:{coordinator.address[1]}", file=sys.stderr)
+    write_results(args.output, args.format, coordinator.run())
+
+
+def command_worker(args):
+    from sharding import run_worker
+
+    run_worker(args.host, args.port)
+
+
+def command_render(args):
+    from batch_render import load_jobs, render_batch, sweep_jobs
+
+    jobs = []
+    for path in args.jobs:
+        jobs.extend(load_jobs(path))
+    for path in args.sweep or []:
+        with open(path) as f:
+            summaries = json.load(f)
+        jobs.extend(sweep_jobs(summaries if isinstance(summaries, list) else [summaries], args.directory, args.figure_format))
+    for path in args.walks or []:
+        name = os.path.splitext(os.path.basename(path))[0]
+        jobs.append({"kind": "walks", "path": os.path.join(args.directory, f"{name}_walks.{args.figure_format}"),
+                     "source": path, "max_points": args.max_points})
+    start = time.perf_counter()
+    rendered = render_batch(jobs, args.workers or None)
+    print(f"rendered {len(rendered)} figures in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+    for path, _ in rendered:
+        print(path)
+
+
+def command_batch(args):
+    from batch_runner import read_requests, run_batch
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        if args.input == "-":
+            run_batch(read_requests(sys.stdin), args.workers, args.order, out)
+        else:
+            with open(args.input) as f:
+                run_batch(read_requests(f), args.workers, args.order, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="wayhome", description="Run the drunk-walk simulator headless.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run one scenario")
+    run.add_argument("--task", choices=tuple(KERNELS), default="A")
+    run.add_argument("--hit-probability", type=float, help="override the per-step hit probability")
+    add_common_options(run)
+    run.set_defaults(func=command_run)
+
+    sweep = commands.add_parser("sweep", help="run a grid of tasks and hit probabilities")
+    sweep.add_argument("--tasks", nargs="+", choices=tuple(KERNELS), default=["A", "B", "C"])
+    sweep.add_argument("--hit-probabilities", nargs="+", type=float)
+    sweep.add_argument("--reweight", action="store_true",
+                       help="simulate once without collisions and reweight by danger-zone exposure")
+    add_common_options(sweep)
+    sweep.set_defaults(func=command_sweep)
+
+    bench = commands.add_parser("bench", help="time the engines")
+    bench.add_argument("--tasks", nargs="+", choices=tuple(KERNELS), default=["A", "B", "C"])
+    bench.add_argument("--engines", nargs="+", choices=ENGINE_CHOICES)
+    add_common_options(bench)
+    bench.set_defaults(attempts=2000)
+    bench.set_defaults(func=command_bench)
+
+    coordinate = commands.add_parser("coordinate", help="hand out shards of a sweep to remote workers")
+    coordinate.add_argument("--tasks", nargs="+", choices=tuple(KERNELS), default=["A", "B", "C"])
+    coordinate.add_argument("--hit-probabilities", nargs="+", type=float)
+    coordinate.add_argument("--host", default="127.0.0.1", help="address to listen on, e.g. 0.0.0.0 for remote workers")
+    coordinate.add_argument("--port", type=int, default=5555)
+    coordinate.add_argument("--shard-timeout", type=float, default=60.,
+                            help="seconds (plus 1 ms per walk) before a silent worker's shard is handed out again")
+    add_common_options(coordinate, local=False) # shards are pseudo-random tallies; workers are separate processes
+    coordinate.set_defaults(func=command_coordinate)
+
+    worker = commands.add_parser("worker", help="run shards for a coordinator")
+    worker.add_argument("--host", default="127.0.0.1")
+    worker.add_argument("--port", type=int, default=5555)
+    worker.set_defaults(func=command_worker)
+
+    render = commands.add_parser("render", help="draw figures to image files on a process pool")
+    render.add_argument("jobs", nargs="*", help="JSON or JSON lines files of render jobs")
+    render.add_argument("--sweep", nargs="+", help="sweep JSON output to draw bar charts and heatmaps of")
+    render.add_argument("--walks", nargs="+", help="NPZ outputs with recorded walks to draw")
+    render.add_argument("-d", "--directory", default="figures")
+    render.add_argument("--figure-format", default="png", help="png, svg, pdf, ...")
+    render.add_argument("--max-points", type=int, default=200, help="points per walk after downsampling")
+    render.add_argument("--workers", type=int, default=0, help="worker processes (default: one per core)")
+    render.set_defaults(func=command_render)
+
+    batch = commands.add_parser("batch", help="run scenario requests from a JSON lines file, one result line each")
+    batch.add_argument("input", nargs="?", default="-", help="JSON lines file, - for stdin")
+    batch.add_argument("--workers", type=int, default=1, help="worker processes")
+    batch.add_argument("--order", choices=("cheapest", "input"), default="cheapest",
+                       help="run order within a priority")
+    batch.add_argument("-o", "--output", help="output file (stdout by default)")
+    batch.set_defaults(func=command_batch)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(format="%(name)s: %(message)s", level=logging.INFO) # e.g. the engine="auto" decisions, on stderr
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())